@@ -0,0 +1,119 @@
+# batch_horizon.py
+"""
+Cálculo por lotes del perfil del horizonte para muchos puntos de observación.
+
+Lee un CSV con columnas ``lat,lon`` (y opcionalmente ``nombre``) y reparte
+los perfiles entre varios procesos. Cada proceso abre el mosaico de terreno
+mapeado en memoria, así que los datos no se copian entre procesos. Con
+``--memoria-compartida`` la matriz se ensambla una sola vez y todos los
+procesos la leen desde memoria compartida. Los resultados se escriben en un
+único CSV a medida que terminan:
+
+    python batch_horizon.py puntos.csv horizontes.csv --procesos 4
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import DATA_DIR, DEFAULT_VIEW_RADIUS_KM, OBSERVER_HEIGHT_M, HORIZON_AZIMUTH_BINS
+
+# Estado por proceso, creado una sola vez en el inicializador
+_worker_profiler = None
+
+def _init_worker(tile_cache_mb: float, shared_name: str = None, shared_lock=None):
+    global _worker_profiler
+    from multiprocessing.util import Finalize
+    from core.terrain_data import TerrainDataLoader
+    from core.visibility import HorizonProfiler
+
+    loader = TerrainDataLoader(use_memmap=True, tile_cache_mb=tile_cache_mb)
+    if shared_name:
+        loader.attach_shared_matrix(shared_name, shared_lock)
+        # Soltar la referencia cuando el proceso del pool termine
+        Finalize(loader, loader.release_shared_matrix, exitpriority=10)
+    else:
+        loader.load_full_terrain_matrix()
+    # Los perfiles de un lote no se repiten: no tiene sentido guardarlos
+    _worker_profiler = HorizonProfiler(loader, cache_size=0)
+
+def _compute_profile(index: int, name: str, lat: float, lon: float,
+                     observer_height_m: float, radius_km: float, n_bins: int):
+    profile = _worker_profiler.compute(lat, lon, observer_height_m, radius_km, n_bins)
+    return index, name, lat, lon, profile
+
+def read_sites(csv_path: str) -> list:
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [(i, row.get('nombre') or f"punto_{i}", float(row['lat']), float(row['lon']))
+                for i, row in enumerate(csv.DictReader(f))]
+
+def _run_batch(sites: list, args, initargs: tuple) -> int:
+    failed = 0
+    with open(args.output_csv, 'w', newline='', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=args.procesos, initializer=_init_worker,
+                                initargs=initargs) as executor:
+        writer = csv.writer(out)
+        writer.writerow(['indice', 'nombre', 'lat', 'lon', 'azimut_deg', 'elevacion_deg', 'distancia_km'])
+        futures = {
+            executor.submit(_compute_profile, index, name, lat, lon, args.altura, args.radio, args.sectores): name
+            for index, name, lat, lon in sites
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                index, name, lat, lon, profile = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Error en {futures[future]}: {e}")
+                continue
+            writer.writerows(
+                (index, name, lat, lon, f"{az:.2f}", f"{elev:.4f}", f"{dist:.3f}")
+                for az, elev, dist in zip(profile['azimuths_deg'], profile['elevation_deg'], profile['distance_km'])
+            )
+            out.flush()
+            print(f"[{done}/{len(sites)}] {name} ({profile['elapsed_s']:.2f}s)")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfiles del horizonte por lotes.")
+    parser.add_argument('sites_csv', help="CSV con columnas lat,lon[,nombre]")
+    parser.add_argument('output_csv', help="CSV de salida (un registro por sector de azimut)")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count(), help="Número de procesos")
+    parser.add_argument('--radio', type=float, default=DEFAULT_VIEW_RADIUS_KM, help="Radio en km")
+    parser.add_argument('--altura', type=float, default=OBSERVER_HEIGHT_M, help="Altura del observador en m")
+    parser.add_argument('--sectores', type=int, default=HORIZON_AZIMUTH_BINS, help="Sectores de azimut")
+    parser.add_argument('--cache-mb', type=float, default=64, help="Caché de bloques por proceso en MB")
+    parser.add_argument('--memoria-compartida', action='store_true',
+                        help="Ensamblar la matriz una vez y compartirla entre procesos")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_DIR):
+        print(f"Error: La carpeta de datos '{DATA_DIR}' no se encontró.")
+        sys.exit(1)
+
+    sites = read_sites(args.sites_csv)
+    print(f"Calculando {len(sites)} perfiles con {args.procesos} procesos...")
+    start = time.perf_counter()
+    shared_loader = None
+    initargs = (args.cache_mb,)
+    if args.memoria_compartida:
+        from core.terrain_data import TerrainDataLoader
+        shared_lock = multiprocessing.Lock()
+        shared_loader = TerrainDataLoader(use_memmap=False)
+        handle = shared_loader.publish_shared_matrix(lock=shared_lock)
+        initargs = (args.cache_mb, handle.name, shared_lock)
+    try:
+        failed = _run_batch(sites, args, initargs)
+    finally:
+        if shared_loader is not None:
+            # El pool ya terminó: eliminar el segmento aunque algún proceso no haya cerrado
+            shared_loader.release_shared_matrix(force_unlink=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"Listo: {len(sites) - failed} perfiles en {elapsed:.1f}s -> {args.output_csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# build_cache.py
+"""
+Genera la caché pre-teselada de terreno (bloques ya decodificados y sin
+comprimir, mapeables en memoria) a partir de los archivos .hgt de DATA_DIR.
+Ejecutar una sola vez (o cuando cambien los archivos .hgt):
+
+    python build_cache.py
+"""
+
+import os
+import sys
+from core.terrain_data import TerrainDataLoader
+from config import DATA_DIR, TERRAIN_CACHE_PATH
+
+def main():
+    if not os.path.exists(DATA_DIR):
+        print(f"Error: La carpeta de datos '{DATA_DIR}' no se encontró.")
+        sys.exit(1)
+
+    loader = TerrainDataLoader(cache_path=None)
+    if not loader.available_hgt_files:
+        print("Error: No se encontraron archivos .hgt para generar la caché.")
+        sys.exit(1)
+    loader.build_terrain_cache(TERRAIN_CACHE_PATH)
+
+if __name__ == "__main__":
+    main()
@@ -10,17 +10,48 @@ import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+TERRAIN_CACHE_PATH = os.path.join(CACHE_DIR, 'terrain_cache.npz')
+DERIVED_CACHE_DIR = os.path.join(CACHE_DIR, 'derived')
+VOID_FILL_CACHE_DIR = os.path.join(CACHE_DIR, 'filled')
 
 # Parámetros del Terreno
 HGT_RESOLUTION = 1201  # Puntos por grado en archivos .hgt
 EQUATOR_LAT_RANGE = (-5, 2) # Rango aproximado de latitud para Ecuador continental
 EQUATOR_LON_RANGE = (-82, -75) # Rango aproximado de longitud para Ecuador continental
+USE_MEMMAP_MOSAIC = True     # Mosaico perezoso con np.memmap en lugar de ensamblar toda la matriz
+TILE_CACHE_MB = 256          # Presupuesto de memoria para bloques .hgt decodificados (LRU)
+PARALLEL_TILE_WORKERS = 0    # Hilos para decodificar bloques al ensamblar la matriz (0/1 = secuencial)
+FILL_VOIDS = True            # Rellenar los vacíos (-32768) de cada bloque al cargarlo
+VOID_FILL_ITERATIONS = 50    # Iteraciones de suavizado (Laplace) sobre las celdas rellenadas
 
 # Parámetros de Visualización 
 DEFAULT_VIEW_RADIUS_KM = 75 # Radio por defecto para la visualización del terreno
 DEFAULT_FIELD_OF_VIEW = 90   # Campo de visión por defecto en grados
 OBSERVER_HEIGHT_M = 0.5      # Altura estándar del observador sobre el terreno en metros
+EARTH_RADIUS_M = 6371000     # Radio medio terrestre para corrección de curvatura
+REFRACTION_COEFFICIENT = 0.13 # Coeficiente de refracción atmosférica estándar
+HORIZON_AZIMUTH_BINS = 3600  # Sectores de azimut del perfil del horizonte (0.1°)
+HORIZON_CACHE_SIZE = 32      # Perfiles del horizonte guardados en memoria
 MAX_RENDER_POINTS = 2000     # Máximo de puntos para submuestreo del terreno para rendimiento
+USE_LOD_RENDERING = True     # Anillos de nivel de detalle según la distancia al observador
+LOD_NEAR_RADIUS_KM = 20      # Radio del anillo a resolución completa; cada anillo siguiente duplica radio y paso
+PYRAMID_MODE = "mean"        # Reducción de la pirámide: "mean" (promedio) o "max" (preserva picos)
+PYRAMID_CACHE_MB = 128       # Memoria para los bloques ya reducidos de la pirámide (LRU)
+DECIMATION_MODE = "max"      # Reducción de la malla uniforme cuando el paso es > 1 ("max" conserva las cumbres)
+VIEW_CULLING = True          # Construir la malla solo con las celdas dentro del radio y de la cuña de visión
+VIEW_CULL_MARGIN_DEG = 10    # Margen angular añadido a la cuña de visión al recortar
+VIEW_CULL_APEX_SLACK = 0.1   # Retroceso extra del vértice de la cuña (fracción del radio) para girar sin reconstruir
+PROGRESSIVE_PREVIEW_POINTS = (150, 500)  # Vértices por lado de las vistas previas progresivas (de gruesa a fina)
+VIEW_WORKER_THREADS = 2      # Hilos del pool de generación de vistas (las solicitudes viejas se cancelan)
+VIEW_REQUEST_DEBOUNCE_MS = 150 # Espera para agrupar cambios rápidos de parámetros en una sola vista
+APPLY_EARTH_CURVATURE = True # Bajar el terreno lejano según la curvatura terrestre (con refracción)
+PROJECTION_CACHE_SIZE = 8    # Ventanas proyectadas a ENU guardadas por observador
+HILLSHADE_AZIMUTH_DEG = 315  # Azimut del sol para el sombreado del relieve (desde el norte)
+HILLSHADE_ALTITUDE_DEG = 45  # Altura del sol sobre el horizonte para el sombreado
+DERIVED_CACHE_MB = 256       # Memoria para pendiente/orientación/sombreado por bloque (LRU)
+VIEW_CACHE_MB = 512          # Memoria para vistas ya construidas (mallas y estadísticas, LRU)
+VIEW_CACHE_DIR = None        # Carpeta para guardar también las vistas en disco (None = solo memoria)
 
 # Colores y Estilos (PyVista)
 TERRAIN_CMAP = "terrain"  # Mapa de colores para el terreno
@@ -0,0 +1,81 @@
+# core/geo_projection.py
+"""
+Proyección de ventanas del mosaico a coordenadas locales ENU (este, norte, arriba).
+
+Las distancias este-oeste se escalan fila a fila con el coseno de la
+latitud y, opcionalmente, el terreno se baja según la curvatura terrestre
+(con refracción), de modo que las vistas de gran radio muestran el
+horizonte real y no el de una Tierra plana.
+"""
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from core.visibility import curvature_drop
+from config import EARTH_RADIUS_M, REFRACTION_COEFFICIENT, APPLY_EARTH_CURVATURE, PROJECTION_CACHE_SIZE
+
+
+class LocalENUProjection:
+    """
+    Plano tangente local centrado en un observador.
+
+    Las ventanas ya proyectadas se guardan (LRU) indexadas por sus ejes de
+    filas y columnas, así que volver a construir la vista del mismo
+    observador (otro azimut, otro recorte) no repite la proyección.
+    """
+
+    def __init__(self, terrain_loader, lat_observer: float, lon_observer: float,
+                 refraction: float = REFRACTION_COEFFICIENT, apply_curvature: bool = APPLY_EARTH_CURVATURE,
+                 cache_size: int = PROJECTION_CACHE_SIZE):
+        self.terrain_loader = terrain_loader
+        self.lat_observer = lat_observer
+        self.lon_observer = lon_observer
+        self.refraction = refraction
+        self.apply_curvature = apply_curvature
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+        span = terrain_loader.hgt_resolution - 1
+        self.cell_ns_km = EARTH_RADIUS_M * math.pi / 180.0 / span / 1000.0
+        self.cell_ew_km = self.cell_ns_km * math.cos(math.radians(lat_observer))
+
+    @staticmethod
+    def _axis_key(indices: np.ndarray) -> tuple:
+        return (float(indices[0]), float(indices[-1]), len(indices))
+
+    def project(self, row_indices: np.ndarray, col_indices: np.ndarray):
+        """
+        Proyecta la rejilla formada por ``row_indices`` x ``col_indices`` (índices del mosaico).
+
+        Returns:
+            tuple: ``east_km`` de forma ``(filas, columnas)``, ``north_km`` de
+            forma ``(filas, 1)`` y ``drop_km`` (caída por curvatura, forma
+            ``(filas, columnas)``, o None si la curvatura está desactivada),
+            todos float32.
+        """
+        key = (self._axis_key(row_indices), self._axis_key(col_indices))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        lats, _ = self.terrain_loader.indices_to_coords_batch(row_indices, np.zeros(len(row_indices)))
+        _, lons = self.terrain_loader.indices_to_coords_batch(np.zeros(len(col_indices)), col_indices)
+        radius_km = EARTH_RADIUS_M / 1000.0
+        north_km = (radius_km * np.radians(lats - self.lat_observer)).astype(np.float32)[:, None]
+        east_scale = (radius_km * np.cos(np.radians(lats))).astype(np.float32)[:, None]
+        east_km = east_scale * np.radians(lons - self.lon_observer).astype(np.float32)[None, :]
+
+        drop_km = None
+        if self.apply_curvature:
+            distance_m = np.hypot(east_km, north_km) * np.float32(1000.0)
+            drop_km = (curvature_drop(distance_m, self.refraction) / np.float32(1000.0)).astype(np.float32)
+
+        result = (east_km, north_km, drop_km)
+        if self.cache_size > 0:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
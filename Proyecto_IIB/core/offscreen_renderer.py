@@ -0,0 +1,104 @@
+# core/offscreen_renderer.py
+"""
+Renderizado del horizonte sin ventana (modo offscreen de PyVista) para lotes de vistas.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from core.viewer_3d import Horizon3DViewer
+from config import DEFAULT_VIEW_RADIUS_KM, DEFAULT_FIELD_OF_VIEW
+
+OUTPUT_FORMATS = ('png', 'npy')
+
+
+class OffscreenHorizonRenderer:
+    """
+    Renderiza vistas del horizonte a archivos sin abrir ninguna ventana.
+
+    Usa un único plotter offscreen para todo el lote y construye la malla
+    del terreno una sola vez por sitio; para cada azimut solo se mueve la
+    cámara y se captura el fotograma.
+    """
+
+    def __init__(self, viewer: Horizon3DViewer, window_size=(1400, 900),
+                 field_of_view: int = DEFAULT_FIELD_OF_VIEW, view_radius_km: int = DEFAULT_VIEW_RADIUS_KM):
+        self.viewer = viewer
+        self.window_size = window_size
+        self.field_of_view = field_of_view
+        self.view_radius_km = view_radius_km
+        self.plotter = None
+
+    def _get_plotter(self):
+        if self.plotter is None:
+            self.plotter = self.viewer.create_plotter(off_screen=True, window_size=self.window_size)
+        return self.plotter
+
+    def render_jobs(self, jobs, output_dir, output_format: str = 'png') -> list[dict]:
+        """
+        Renderiza una lista de trabajos ``(lat, lon, azimut)`` a archivos.
+
+        Args:
+            jobs: Iterable de tuplas ``(lat, lon, azimut)``.
+            output_dir: Carpeta de salida (se crea si no existe).
+            output_format: 'png' para imágenes o 'npy' para arreglos RGB de NumPy.
+
+        Returns:
+            list[dict]: Un registro por trabajo, en el orden de entrada, con la
+            ruta generada y los tiempos de malla y de fotograma en segundos.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Formato de salida desconocido: {output_format}")
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Agrupar por sitio conservando el orden de primera aparición
+        jobs = [(float(lat), float(lon), int(azimut)) for lat, lon, azimut in jobs]
+        sites = {}
+        for index, (lat, lon, azimut) in enumerate(jobs):
+            sites.setdefault((lat, lon), []).append((index, azimut))
+
+        plotter = self._get_plotter()
+        results = [None] * len(jobs)
+        for (lat, lon), site_jobs in sites.items():
+            start = time.perf_counter()
+            surface, _, _ = self.viewer.build_terrain_surface(lat, lon, self.view_radius_km)
+            self.viewer.add_terrain_to_plotter(plotter, surface)
+            mesh_time = time.perf_counter() - start
+            print(f"Malla para ({lat:.4f}, {lon:.4f}): {surface.n_points} puntos en {mesh_time:.2f}s")
+
+            previous_azimut, previous_image = None, None
+            for index, azimut in site_jobs:
+                start = time.perf_counter()
+                self.viewer.configure_camera(plotter, azimut, self.field_of_view, self.view_radius_km)
+                # Sin un render explícito la captura devuelve el fotograma anterior
+                plotter.render()
+                filename = output_dir / f"{index:04d}_{lat:.4f}_{lon:.4f}_{azimut:03d}.{output_format}"
+                if output_format == 'png':
+                    image = plotter.screenshot(str(filename), return_img=True)
+                else:
+                    image = plotter.screenshot(return_img=True)
+                    np.save(filename, image)
+                frame_time = time.perf_counter() - start
+                if previous_image is not None and azimut != previous_azimut and np.array_equal(image, previous_image):
+                    print(f"Advertencia: el fotograma de azimut {azimut}° es idéntico al de {previous_azimut}°; "
+                          f"la cámara no se actualizó antes de la captura.")
+                previous_azimut, previous_image = azimut, image
+                results[index] = {
+                    'lat': lat,
+                    'lon': lon,
+                    'azimut': azimut,
+                    'path': str(filename),
+                    'mesh_time_s': mesh_time,
+                    'frame_time_s': frame_time,
+                }
+                print(f"  Azimut {azimut:3d}° -> {filename.name} ({frame_time * 1000:.0f} ms)")
+        return results
+
+    def close(self):
+        """Libera el plotter offscreen."""
+        if self.plotter is not None:
+            self.plotter.close()
+            self.plotter = None
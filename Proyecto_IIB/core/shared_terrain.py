@@ -0,0 +1,121 @@
+# core/shared_terrain.py
+"""
+Matriz de terreno publicada en memoria compartida para varios procesos.
+
+El bloque compartido empieza con una pequeña cabecera (firma, contador de
+referencias y forma de la matriz) seguida de los datos int16. Los procesos
+se conectan por nombre y obtienen una vista NumPy sin copiar los datos.
+"""
+
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+SHARED_MAGIC = 0x54455252  # "TERR"
+HEADER_FIELDS = 4           # firma, referencias, filas, columnas
+HEADER_BYTES = HEADER_FIELDS * np.dtype(np.int64).itemsize
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    """Abre un segmento existente sin dejarlo registrado en el resource_tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13: al conectarse el segmento queda registrado y el tracker lo
+    # borraría al terminar este proceso; se desregistra enseguida.
+    segment = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+class SharedTerrainMatrix:
+    """
+    Manejador de la matriz de terreno en memoria compartida con conteo de referencias.
+
+    Cada ``create`` o ``attach`` suma una referencia y cada ``close`` la
+    resta; el segmento se elimina cuando el contador llega a cero. El
+    contador se protege con ``lock``, que debe ser un ``multiprocessing.Lock``
+    heredado por los procesos (por ejemplo, pasado en ``initargs`` de un
+    pool). Sin él solo se protege entre hilos del mismo proceso.
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory, lock=None):
+        self._segment = segment
+        self._lock = lock if lock is not None else threading.Lock()
+        self._header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=segment.buf)
+        if int(self._header[0]) != SHARED_MAGIC:
+            raise ValueError(f"El segmento '{segment.name}' no contiene una matriz de terreno.")
+        shape = (int(self._header[2]), int(self._header[3]))
+        self.matrix = np.ndarray(shape, dtype=np.int16, buffer=segment.buf, offset=HEADER_BYTES)
+        self.closed = False
+        self.unlinked = False
+
+    @classmethod
+    def create(cls, shape: tuple, name: str = None, lock=None) -> "SharedTerrainMatrix":
+        """Reserva un segmento nuevo para una matriz ``shape`` (contenido sin inicializar)."""
+        rows, cols = shape
+        size = HEADER_BYTES + rows * cols * np.dtype(np.int16).itemsize
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=segment.buf)
+        header[:] = (SHARED_MAGIC, 1, rows, cols)
+        del header
+        return cls(segment, lock)
+
+    @classmethod
+    def attach(cls, name: str, lock=None) -> "SharedTerrainMatrix":
+        """Se conecta por nombre a una matriz ya publicada y suma una referencia."""
+        handle = cls(_open_segment(name), lock)
+        with handle._lock:
+            handle._header[1] += 1
+        return handle
+
+    @property
+    def name(self) -> str:
+        return self._segment.name
+
+    @property
+    def refcount(self) -> int:
+        return int(self._header[1]) if not self.closed else 0
+
+    def close(self, force_unlink: bool = False):
+        """
+        Libera esta referencia; elimina el segmento si era la última.
+
+        Antes de cerrar hay que soltar las vistas obtenidas de ``matrix``
+        (por ejemplo, ``loader.full_terrain_matrix``). Con ``force_unlink`` el
+        segmento se elimina aunque queden referencias (procesos que terminaron
+        sin cerrar la suya).
+        """
+        if self.closed:
+            return
+        with self._lock:
+            self._header[1] -= 1
+            remaining = int(self._header[1])
+        self.matrix = None
+        self._header = None
+        self.closed = True
+        self._segment.close()
+        if remaining <= 0 or force_unlink:
+            self.unlink()
+
+    def unlink(self):
+        """Elimina el segmento del sistema (las vistas ya abiertas siguen siendo válidas)."""
+        if not self.unlinked:
+            try:
+                if getattr(self._segment, '_track', True):
+                    # unlink() desregistra el nombre; si este proceso se conectó (o un hijo
+                    # con el mismo tracker ya lo desregistró) se registra de nuevo para que
+                    # el tracker no reciba una baja de un nombre desconocido
+                    resource_tracker.register(self._segment._name, "shared_memory")
+                self._segment.unlink()
+            except FileNotFoundError:
+                pass
+            self.unlinked = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
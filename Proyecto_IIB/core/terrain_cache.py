@@ -0,0 +1,135 @@
+# core/terrain_cache.py
+"""
+Caché pre-teselada de los bloques .hgt para un arranque rápido.
+
+Los bloques se guardan ya decodificados (int16 en orden nativo) y sin
+comprimir en un único arreglo ``.npy`` de forma ``(bloques, res, res)``,
+que se abre mapeado en memoria: leer un bloque es tomar una vista del
+arreglo, sin descompresión ni copia. Junto a él, un pequeño índice ``.npz``
+guarda la posición, tamaño y fecha de modificación de cada archivo .hgt de
+origen.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+CACHE_FORMAT_VERSION = 2
+
+
+def tiles_path_for(cache_path) -> Path:
+    """Ruta del arreglo de bloques que acompaña al índice ``cache_path``."""
+    return Path(cache_path).with_suffix('.tiles.npy')
+
+
+def build_terrain_cache(hgt_files: dict, cache_path, hgt_resolution: int) -> Path:
+    """
+    Convierte los archivos .hgt en la caché pre-teselada.
+
+    Args:
+        hgt_files: Diccionario ``{(lat_int, lon_int): ruta_hgt}``.
+        cache_path: Ruta del índice .npz de destino; los bloques se escriben
+            en ``tiles_path_for(cache_path)``.
+        hgt_resolution: Puntos por lado de cada bloque.
+
+    Returns:
+        Path: Ruta del índice generado.
+    """
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tiles_path = tiles_path_for(cache_path)
+
+    # Escribir en temporales y reemplazar para no dejar cachés a medio escribir;
+    # el índice se reemplaza al final, cuando los bloques ya están completos
+    keys = sorted(hgt_files)
+    tmp_tiles_path = tiles_path.with_name(tiles_path.name + '.tmp')
+    tiles = np.lib.format.open_memmap(tmp_tiles_path, mode='w+', dtype=np.int16,
+                                      shape=(len(keys), hgt_resolution, hgt_resolution))
+    for position, key in enumerate(keys):
+        tiles[position] = np.fromfile(hgt_files[key], dtype='>i2').reshape((hgt_resolution, hgt_resolution))
+    tiles.flush()
+    del tiles
+    os.replace(tmp_tiles_path, tiles_path)
+
+    stats = [os.stat(hgt_files[key]) for key in keys]
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            index_keys=np.array(keys, dtype=np.int64).reshape(-1, 2),
+            index_mtimes=np.array([st.st_mtime for st in stats], dtype=np.float64),
+            index_sizes=np.array([st.st_size for st in stats], dtype=np.int64),
+            hgt_resolution=np.array(hgt_resolution),
+            format_version=np.array(CACHE_FORMAT_VERSION),
+        )
+    os.replace(tmp_path, cache_path)
+    print(f"Caché de terreno generada: {cache_path} ({len(keys)} bloques, "
+          f"{tiles_path.stat().st_size / (1024 * 1024):.1f} MB en {tiles_path.name})")
+    return cache_path
+
+
+class TerrainCacheFile:
+    """
+    Lector de la caché de terreno: los bloques son vistas del arreglo mapeado en memoria.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = Path(cache_path)
+        with np.load(self.cache_path) as index:
+            self.hgt_resolution = int(index['hgt_resolution'])
+            self.format_version = int(index['format_version'])
+            keys = index['index_keys']
+            mtimes = index['index_mtimes']
+            sizes = index['index_sizes']
+        self.index = {
+            (int(lat), int(lon)): (float(mtime), int(size))
+            for (lat, lon), mtime, size in zip(keys, mtimes, sizes)
+        }
+        self._positions = {key: position for position, key in enumerate(self.index)}
+        self._tiles = None
+        tiles_path = tiles_path_for(self.cache_path)
+        if self.format_version == CACHE_FORMAT_VERSION and tiles_path.is_file():
+            self._tiles = np.load(tiles_path, mmap_mode='r')
+
+    def is_fresh(self, hgt_files: dict, hgt_resolution: int) -> bool:
+        """Comprueba que la caché corresponde exactamente a los archivos .hgt actuales."""
+        if self.format_version != CACHE_FORMAT_VERSION or self.hgt_resolution != hgt_resolution:
+            return False
+        if self._tiles is None or self._tiles.shape != (len(self.index), hgt_resolution, hgt_resolution):
+            return False
+        if set(self.index) != set(hgt_files):
+            return False
+        for key, filepath in hgt_files.items():
+            st = os.stat(filepath)
+            mtime, size = self.index[key]
+            if st.st_size != size or st.st_mtime != mtime:
+                return False
+        return True
+
+    def read_tile(self, lat_int: int, lon_int: int) -> np.ndarray:
+        """Devuelve el bloque indicado (int16 nativo) como vista de solo lectura, sin copiarlo."""
+        return self._tiles[self._positions[(lat_int, lon_int)]]
+
+    def close(self):
+        # El mapeo se libera cuando no quedan vistas de bloques en uso
+        self._tiles = None
+
+
+def open_terrain_cache(cache_path, hgt_files: dict, hgt_resolution: int):
+    """
+    Abre la caché si existe y está al día; en otro caso devuelve None.
+    """
+    if not cache_path or not Path(cache_path).is_file():
+        return None
+    try:
+        cache = TerrainCacheFile(cache_path)
+    except Exception as e:
+        print(f"No se pudo abrir la caché de terreno {cache_path}: {e}")
+        return None
+    if not cache.is_fresh(hgt_files, hgt_resolution):
+        print(f"La caché de terreno {cache_path} está desactualizada; se usarán los archivos .hgt.")
+        cache.close()
+        return None
+    print(f"Usando caché de terreno: {cache_path}")
+    return cache
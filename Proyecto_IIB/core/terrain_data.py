@@ -4,9 +4,22 @@ Módulo para la carga y gestión de datos de elevación del terreno (.hgt).
 """
 
 import math
+import threading
+import time
+import tracemalloc
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import DATA_DIR, HGT_RESOLUTION
+from config import (
+    DATA_DIR, HGT_RESOLUTION, USE_MEMMAP_MOSAIC, TILE_CACHE_MB, PARALLEL_TILE_WORKERS,
+    TERRAIN_CACHE_PATH, PYRAMID_MODE, PYRAMID_CACHE_MB, FILL_VOIDS, VOID_FILL_CACHE_DIR, EARTH_RADIUS_M
+)
+from core.terrain_mosaic import TerrainMosaic, VOID_VALUE
+from core.tile_cache import TileCache
+from core.terrain_cache import build_terrain_cache, open_terrain_cache
+from core.terrain_pyramid import PYRAMID_MODES, DownsampledView, downsample_2x
+from core.shared_terrain import SharedTerrainMatrix
+from core.void_fill import VoidFillCache
 
 from PyQt5.QtCore import QObject, pyqtSignal
 
@@ -18,12 +31,33 @@ class TerrainDataLoader(QObject):
     # Señales para comunicación con la GUI
     full_terrain_matrix_loaded = pyqtSignal()
     error_loading_matrix = pyqtSignal(str)
+    tile_loaded = pyqtSignal(int, int, int, int)  # lat, lon, bloques cargados, total
 
-    def __init__(self, data_directory: str = DATA_DIR):
+    def __init__(self, data_directory: str = DATA_DIR, use_memmap: bool = USE_MEMMAP_MOSAIC,
+                 tile_cache_mb: float = TILE_CACHE_MB, parallel_workers: int = PARALLEL_TILE_WORKERS,
+                 cache_path: str = TERRAIN_CACHE_PATH, fill_voids: bool = FILL_VOIDS,
+                 void_fill_cache_dir: str = VOID_FILL_CACHE_DIR):
         super().__init__()
         self.data_directory = Path(data_directory)
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.terrain_cache = None
         self.hgt_resolution = HGT_RESOLUTION
+        self.use_memmap = use_memmap
+        self.parallel_workers = parallel_workers
+        self.tile_cache = TileCache(tile_cache_mb)
+        self._tile_locks = {}
+        self._tile_locks_guard = threading.Lock()
+        self.fill_voids = fill_voids
+        self.void_fill_cache = VoidFillCache(void_fill_cache_dir) if fill_voids else None
         self.full_terrain_matrix = None
+        self.shared_matrix = None
+        self.load_stats = {}
+        self._pyramid = {}
+        self.pyramid_cache = TileCache(PYRAMID_CACHE_MB)
+        self.loaded_tiles = set()
+        self.loading_incremental = False
+        self.load_center = None
+        self._cancel_loading = False
         self.available_hgt_files = {}
         self.sorted_lats = []
         self.sorted_lons = []
@@ -34,6 +68,7 @@ class TerrainDataLoader(QObject):
 
         try:
             self._scan_available_hgt_files()
+            self.terrain_cache = open_terrain_cache(self.cache_path, self.available_hgt_files, self.hgt_resolution)
         except Exception as e:
             self.error_loading_matrix.emit(f"Error al escanear archivos HGT: {e}")
 
@@ -72,10 +107,60 @@ class TerrainDataLoader(QObject):
         self.lat_max_matrix = max(self.sorted_lats)
         self.lon_min_matrix = min(self.sorted_lons)
         self.lon_max_matrix = max(self.sorted_lons)
+        self._build_block_offsets()
 
         print(f"Archivos .hgt encontrados: {len(self.available_hgt_files)}")
         print(f"Rango de datos disponible: Lat {self.lat_min_matrix}° a {self.lat_max_matrix}°, Lon {self.lon_min_matrix}° a {self.lon_max_matrix}°")
 
+    def _build_block_offsets(self):
+        """
+        Precalcula las tablas de búsqueda de bloques y sus desplazamientos acumulados.
+
+        ``_lat_keys``/``_lon_keys`` están en orden ascendente para usar
+        ``np.searchsorted``; ``_row_offsets``/``_col_offsets`` están en el orden
+        del mosaico (``sorted_lats``/``sorted_lons``).
+        """
+        n_lats, n_lons = len(self.sorted_lats), len(self.sorted_lons)
+        row_sizes = [self._block_extent(i, n_lats)[1] for i in range(n_lats)]
+        col_sizes = [self._block_extent(j, n_lons)[1] for j in range(n_lons)]
+        self._row_offsets = np.concatenate(([0], np.cumsum(row_sizes)[:-1])).astype(np.int64)
+        self._col_offsets = np.concatenate(([0], np.cumsum(col_sizes)[:-1])).astype(np.int64)
+        self._lat_keys = np.array(self.sorted_lats[::-1], dtype=np.int64)
+        self._lon_keys = np.array(self.sorted_lons, dtype=np.int64)
+        self.matrix_shape = (int(sum(row_sizes)), int(sum(col_sizes)))
+
+    def _coords_to_fractional_indices(self, lats, lons) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Convierte arreglos de coordenadas a índices fraccionarios (row, col) del mosaico.
+
+        Cada bloque .hgt cubre desde su esquina suroeste ``(lat_int, lon_int)``
+        hasta ``(lat_int + 1, lon_int + 1)``; la fila 0 del bloque es su borde norte.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        lats, lons = np.broadcast_arrays(lats, lons)
+
+        in_range = ((self.lat_min_matrix <= lats) & (lats < self.lat_max_matrix + 1) &
+                    (self.lon_min_matrix <= lons) & (lons < self.lon_max_matrix + 1))
+        if not np.all(in_range):
+            n_out = int(np.count_nonzero(~in_range))
+            raise ValueError(f"{n_out} coordenada(s) fuera del rango de datos disponibles.")
+
+        lat_origin = np.floor(lats).astype(np.int64)
+        lon_origin = np.floor(lons).astype(np.int64)
+        lat_pos = np.searchsorted(self._lat_keys, lat_origin)
+        lon_pos = np.searchsorted(self._lon_keys, lon_origin)
+        lat_pos = np.minimum(lat_pos, len(self._lat_keys) - 1)
+        lon_pos = np.minimum(lon_pos, len(self._lon_keys) - 1)
+        if np.any(self._lat_keys[lat_pos] != lat_origin) or np.any(self._lon_keys[lon_pos] != lon_origin):
+            raise ValueError("Hay coordenadas en bloques que no forman parte del mosaico.")
+
+        span = self.hgt_resolution - 1
+        lat_block_idx = len(self._lat_keys) - 1 - lat_pos
+        rows = self._row_offsets[lat_block_idx] + (lat_origin + 1 - lats) * span
+        cols = self._col_offsets[lon_pos] + (lons - lon_origin) * span
+        return rows, cols
+
     def _load_single_hgt(self, filepath: Path) -> np.ndarray:
         """Carga un archivo .hgt y devuelve su matriz de elevación."""
         try:
@@ -87,45 +172,381 @@ class TerrainDataLoader(QObject):
             print(f"Error al cargar {filepath}: {e}")
             return np.full((self.hgt_resolution, self.hgt_resolution), -32768, dtype=np.int16)
 
+    def _open_hgt_memmap(self, filepath: Path) -> np.ndarray:
+        """Mapea un archivo .hgt en memoria sin leerlo; recurre a la lectura completa si falla."""
+        try:
+            return np.memmap(filepath, dtype='>i2', mode='r', shape=(self.hgt_resolution, self.hgt_resolution))
+        except Exception as e:
+            print(f"No se pudo mapear {filepath} en memoria ({e}); se leerá completo.")
+            return self._load_single_hgt(filepath)
+
+    def _load_tile(self, lat_int: int, lon_int: int):
+        """
+        Devuelve el bloque decodificado (int16 nativo) de la posición dada.
+
+        Pasa por la caché LRU de bloques; solo en un fallo se lee el archivo
+        (de la caché pre-teselada si está disponible, o del .hgt original) y,
+        con ``fill_voids``, se rellenan sus vacíos. Devuelve None si no existe
+        archivo para esa posición.
+        """
+        key = (lat_int, lon_int)
+        filepath = self.available_hgt_files.get(key)
+        if filepath is None:
+            return None
+        tile = self.tile_cache.get(key)
+        if tile is not None:
+            return tile
+        # Un candado por bloque: si dos hilos piden el mismo bloque, solo uno lo decodifica
+        with self._tile_locks_guard:
+            tile_lock = self._tile_locks.setdefault(key, threading.Lock())
+        with tile_lock:
+            # Otro hilo pudo decodificarlo mientras se esperaba el candado (sin contar otro fallo)
+            tile = self.tile_cache.peek(key)
+            if tile is None:
+                if self.terrain_cache is not None:
+                    tile = self.terrain_cache.read_tile(lat_int, lon_int)
+                else:
+                    source = self._open_hgt_memmap(filepath) if self.use_memmap else self._load_single_hgt(filepath)
+                    tile = np.array(source, dtype=np.int16)
+                if self.void_fill_cache is not None:
+                    tile = self.void_fill_cache.get_filled(lat_int, lon_int, tile, filepath)
+                self.tile_cache.put(key, tile)
+        return tile
+
+    def _max_tile_pyramid_level(self) -> int:
+        """Mayor nivel de la pirámide cuyas celdas caben enteras en un bloque .hgt."""
+        span, level = self.hgt_resolution - 1, 0
+        while span % 2 ** (level + 1) == 0:
+            level += 1
+        return level
+
+    def _get_pyramid_block(self, block_row: int, block_col: int, level: int, mode: str):
+        """
+        Bloque (i, j) reducido al nivel ``level`` de la pirámide, o None si no existe.
+
+        Se reduce el bloque completo de la matriz de terreno (con su fila y
+        columna de borde) aplicando ``downsample_2x`` ``level`` veces; el
+        resultado tiene ``(res - 1) / 2**level + 1`` celdas por lado. Durante
+        una carga incremental los bloques que aún no llegaron no se cachean.
+        """
+        key = (self.sorted_lats[block_row], self.sorted_lons[block_col])
+        if key not in self.available_hgt_files:
+            return None
+        cache_key = key + (level, mode)
+        block = self.pyramid_cache.get(cache_key)
+        if block is not None:
+            return block
+        is_final = not self.loading_incremental or key in self.loaded_tiles
+        if level == 1:
+            source = self._get_matrix_block(block_row, block_col)
+        else:
+            source = self._get_pyramid_block(block_row, block_col, level - 1, mode)
+        block = downsample_2x(np.asarray(source), mode)
+        if is_final:
+            self.pyramid_cache.put(cache_key, block)
+        return block
+
+    def _get_matrix_block(self, block_row: int, block_col: int) -> np.ndarray:
+        """Bloque (i, j) completo (res x res) tal como está en la matriz de terreno."""
+        if isinstance(self.full_terrain_matrix, TerrainMosaic):
+            return self._get_mosaic_block(block_row, block_col)
+        span = self.hgt_resolution - 1
+        row_start, col_start = block_row * span, block_col * span
+        return self.full_terrain_matrix[row_start:row_start + self.hgt_resolution,
+                                        col_start:col_start + self.hgt_resolution]
+
+    def _invalidate_tile_pyramid(self, lat_int: int, lon_int: int):
+        """Descarta los niveles reducidos cacheados de un bloque (por ejemplo, al reescribirlo)."""
+        for level in range(1, self._max_tile_pyramid_level() + 1):
+            for mode in PYRAMID_MODES:
+                self.pyramid_cache.discard((lat_int, lon_int, level, mode))
+
+    def _open_tile_source(self, key: tuple, filepath: Path) -> np.ndarray:
+        """Bloque sin copiar: vista de la caché pre-teselada o mapeo en memoria del .hgt."""
+        if self.terrain_cache is not None:
+            return self.terrain_cache.read_tile(*key)
+        return self._open_hgt_memmap(filepath)
+
+    def _warm_void_fill(self, lat_int: int, lon_int: int):
+        """Deja el bloque rellenado en la caché de disco de vacíos sin guardarlo en la caché de bloques."""
+        if self.void_fill_cache is None or self.void_fill_cache.cache_dir is None:
+            return
+        filepath = self.available_hgt_files[(lat_int, lon_int)]
+        self.void_fill_cache.get_filled(lat_int, lon_int, self._open_tile_source((lat_int, lon_int), filepath),
+                                        filepath)
+
+    def _get_mosaic_block(self, block_row: int, block_col: int):
+        """Devuelve el bloque (i, j) del mosaico, o None si no existe."""
+        return self._load_tile(self.sorted_lats[block_row], self.sorted_lons[block_col])
+
+    def _block_extent(self, index: int, n_blocks: int) -> tuple[int, int]:
+        """Devuelve (inicio, tamaño) de un bloque recortado dentro de la matriz completa."""
+        span = self.hgt_resolution - 1
+        return index * span, span + (1 if index == n_blocks - 1 else 0)
+
+    def _write_block_into(self, out: np.ndarray, i: int, j: int):
+        """
+        Decodifica el bloque (i, j) y lo escribe recortado en su posición final de ``out``.
+
+        El bloque no pasa por la caché de bloques: se copia (y convierte a
+        int16 nativo) directamente desde el mapeo del .hgt o de la caché
+        pre-teselada, de modo que solo el relleno de vacíos necesita un
+        bloque temporal.
+        """
+        row_start, n_rows = self._block_extent(i, len(self.sorted_lats))
+        col_start, n_cols = self._block_extent(j, len(self.sorted_lons))
+        target = out[row_start:row_start + n_rows, col_start:col_start + n_cols]
+        key = (self.sorted_lats[i], self.sorted_lons[j])
+        filepath = self.available_hgt_files.get(key)
+        if filepath is None:
+            target.fill(VOID_VALUE)
+            return
+        block = self.tile_cache.peek(key)
+        if block is None:
+            block = self._open_tile_source(key, filepath)
+            if self.void_fill_cache is not None:
+                block = self.void_fill_cache.get_filled(*key, block, filepath)
+        target[...] = block[:n_rows, :n_cols]
+
+    def _assemble_preallocated(self, max_workers: int = 1, out: np.ndarray = None) -> np.ndarray:
+        """
+        Ensambla la matriz completa en un único buffer int16 preasignado.
+
+        La forma final se calcula de antemano y cada bloque recortado se
+        escribe una sola vez en su posición, sin dejar copias en la caché de
+        bloques: el pico de memoria es la matriz más un bloque temporal por
+        hilo (solo si hay que rellenar vacíos). Con ``max_workers > 1`` los
+        bloques se decodifican en un pool de hilos. ``out`` permite escribir
+        en un buffer externo (por ejemplo, memoria compartida).
+        """
+        n_lats, n_lons = len(self.sorted_lats), len(self.sorted_lons)
+        span = self.hgt_resolution - 1
+        if out is None:
+            out = np.empty((n_lats * span + 1, n_lons * span + 1), dtype=np.int16)
+        positions = [(i, j) for i in range(n_lats) for j in range(n_lons)]
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(self._write_block_into, out, i, j) for i, j in positions]
+                for future in futures:
+                    future.result()
+        else:
+            for i, j in positions:
+                self._write_block_into(out, i, j)
+        return out
+
     # --- Métodos públicos ---
 
     def load_full_terrain_matrix(self):
         """
         Ensambla todos los archivos .hgt en una única matriz de terreno.
+
+        Con ``use_memmap`` activo no se lee ningún archivo: se crea un
+        ``TerrainMosaic`` que mapea cada bloque en memoria la primera vez que
+        una ventana lo toca.
         """
         if self.full_terrain_matrix is not None:
             print("Matriz de terreno ya cargada.")
             self.full_terrain_matrix_loaded.emit()
             return self.full_terrain_matrix
 
+        if self.use_memmap:
+            self.full_terrain_matrix = TerrainMosaic(
+                self._get_mosaic_block, len(self.sorted_lats), len(self.sorted_lons), self.hgt_resolution
+            )
+            print(f"Mosaico de terreno mapeado en memoria: {self.full_terrain_matrix.shape}")
+            self.full_terrain_matrix_loaded.emit()
+            return self.full_terrain_matrix
+
         print("Ensamblando matriz de terreno completa...")
         try:
-            rows_of_blocks = []
-            for i, lat_int in enumerate(self.sorted_lats):
-                current_row_blocks = []
-                for j, lon_int in enumerate(self.sorted_lons):
-                    filepath = self.available_hgt_files.get((lat_int, lon_int))
-                    block = self._load_single_hgt(filepath) if filepath else np.full((self.hgt_resolution, self.hgt_resolution), -32768, dtype=np.int16)
-                    # Recortar bordes compartidos
-                    if j < len(self.sorted_lons) - 1:
-                        block = block[:, :-1]
-                    if i < len(self.sorted_lats) - 1:
-                        block = block[:-1, :]
-                    current_row_blocks.append(block)
-                if current_row_blocks:
-                    rows_of_blocks.append(np.hstack(current_row_blocks))
-            if rows_of_blocks:
-                self.full_terrain_matrix = np.vstack(rows_of_blocks)
-                print(f"Matriz de terreno completa cargada: {self.full_terrain_matrix.shape}")
-                self.full_terrain_matrix_loaded.emit()
-            else:
+            if not self.sorted_lats or not self.sorted_lons:
+                raise ValueError("No se pudo ensamblar la matriz de terreno.")
+
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline_bytes, _ = tracemalloc.get_traced_memory()
+            start_time = time.perf_counter()
+            try:
+                self.full_terrain_matrix = self._assemble_preallocated(max(1, self.parallel_workers))
+                elapsed = time.perf_counter() - start_time
+                _, peak_bytes = tracemalloc.get_traced_memory()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+            self.load_stats = {
+                'load_time_s': elapsed,
+                'matrix_mb': self.full_terrain_matrix.nbytes / (1024 * 1024),
+                'peak_memory_mb': (peak_bytes - baseline_bytes) / (1024 * 1024),
+                'workers': max(1, self.parallel_workers),
+            }
+            print(f"Matriz de terreno completa cargada: {self.full_terrain_matrix.shape} "
+                  f"en {elapsed:.2f}s | matriz {self.load_stats['matrix_mb']:.0f} MB, "
+                  f"pico {self.load_stats['peak_memory_mb']:.0f} MB")
+            self.full_terrain_matrix_loaded.emit()
+            return self.full_terrain_matrix
+        except Exception as e:
+            self.error_loading_matrix.emit(f"Error al cargar la matriz de terreno: {e}")
+            self.full_terrain_matrix = None
+            return None
+
+    def load_terrain_incremental(self, center=None):
+        """
+        Carga el terreno bloque a bloque, del más cercano a ``center`` (lat, lon) al más lejano.
+
+        Sin ``center`` se usa ``load_center`` (útil al conectar el método a
+        ``QThread.started``) o, en su defecto, el centro del mosaico.
+
+        La matriz queda disponible desde el principio (con vacíos donde aún
+        no llegaron datos), cada bloque emite ``tile_loaded`` y
+        ``is_region_loaded`` indica si ya se puede generar una vista en una
+        zona. Con ``use_memmap`` el mosaico ya lee cualquier bloque bajo
+        demanda, así que los bloques solo se precargan (decodificación y
+        relleno de vacíos) en la caché de bloques, y solo los más cercanos que
+        caben en su presupuesto; de los demás únicamente se deja el relleno de
+        vacíos en disco, para no expulsar los bloques cercanos.
+        ``cancel_loading`` detiene la carga entre bloques.
+        """
+        if self.full_terrain_matrix is not None and not self.loading_incremental:
+            print("Matriz de terreno ya cargada.")
+            self.full_terrain_matrix_loaded.emit()
+            return self.full_terrain_matrix
+
+        try:
+            if not self.sorted_lats or not self.sorted_lons:
                 raise ValueError("No se pudo ensamblar la matriz de terreno.")
+            if center is None:
+                center = self.load_center
+            if center is None:
+                center = ((self.lat_min_matrix + self.lat_max_matrix) / 2,
+                          (self.lon_min_matrix + self.lon_max_matrix) / 2)
+            positions = [(i, j) for i, lat_int in enumerate(self.sorted_lats)
+                         for j, lon_int in enumerate(self.sorted_lons)
+                         if (lat_int, lon_int) in self.available_hgt_files]
+            positions.sort(key=lambda p: math.hypot(self.sorted_lats[p[0]] + 0.5 - center[0],
+                                                    self.sorted_lons[p[1]] + 0.5 - center[1]))
+
+            start_time = time.perf_counter()
+            self._cancel_loading = False
+            self.loaded_tiles = set()
+            tile_nbytes = self.hgt_resolution * self.hgt_resolution * np.dtype(np.int16).itemsize
+            preload_tiles = self.tile_cache.max_bytes // tile_nbytes
+            if self.use_memmap:
+                if self.full_terrain_matrix is None:
+                    self.full_terrain_matrix = TerrainMosaic(
+                        self._get_mosaic_block, len(self.sorted_lats), len(self.sorted_lons), self.hgt_resolution
+                    )
+            else:
+                self.loading_incremental = True
+                self.full_terrain_matrix = np.full(self.matrix_shape, VOID_VALUE, dtype=np.int16)
+                self.pyramid_cache.clear()
+
+            for i, j in positions:
+                if self._cancel_loading:
+                    print("Carga de terreno cancelada.")
+                    return self.full_terrain_matrix
+                key = (self.sorted_lats[i], self.sorted_lons[j])
+                if self.use_memmap:
+                    if len(self.loaded_tiles) < preload_tiles:
+                        self._load_tile(*key)
+                    else:
+                        self._warm_void_fill(*key)
+                else:
+                    self._write_block_into(self.full_terrain_matrix, i, j)
+                    self._invalidate_tile_pyramid(*key)
+                self.loaded_tiles.add(key)
+                self.tile_loaded.emit(key[0], key[1], len(self.loaded_tiles), len(positions))
+
+            self.loading_incremental = False
+            print(f"Terreno cargado por bloques: {len(positions)} bloques en "
+                  f"{time.perf_counter() - start_time:.2f}s")
+            self.full_terrain_matrix_loaded.emit()
             return self.full_terrain_matrix
         except Exception as e:
             self.error_loading_matrix.emit(f"Error al cargar la matriz de terreno: {e}")
+            self.loading_incremental = False
             self.full_terrain_matrix = None
             return None
 
+    def cancel_loading(self):
+        """Pide detener ``load_terrain_incremental`` después del bloque en curso."""
+        self._cancel_loading = True
+
+    def is_region_loaded(self, lat: float, lon: float, radius_km: float) -> bool:
+        """
+        Indica si ya llegaron todos los bloques que cubren el radio alrededor de (lat, lon).
+
+        Fuera de una carga incremental basta con que la matriz exista (el
+        mosaico perezoso lee cualquier bloque al pedirlo).
+        """
+        if self.full_terrain_matrix is None:
+            return False
+        if not self.loading_incremental:
+            return True
+        radius_deg = radius_km / (EARTH_RADIUS_M * math.pi / 180.0 / 1000.0)
+        lon_radius_deg = radius_deg / max(math.cos(math.radians(lat)), 1e-6)
+        for lat_int in range(math.floor(lat - radius_deg), math.floor(lat + radius_deg) + 1):
+            for lon_int in range(math.floor(lon - lon_radius_deg), math.floor(lon + lon_radius_deg) + 1):
+                key = (lat_int, lon_int)
+                if key in self.available_hgt_files and key not in self.loaded_tiles:
+                    return False
+        return True
+
+    def publish_shared_matrix(self, name: str = None, lock=None) -> SharedTerrainMatrix:
+        """
+        Ensambla la matriz completa en memoria compartida para otros procesos.
+
+        Los procesos hijos llaman a ``attach_shared_matrix`` con el nombre del
+        manejador devuelto y leen los mismos datos sin copiarlos. ``lock``
+        debe ser un ``multiprocessing.Lock`` compartido con esos procesos.
+        """
+        if self.shared_matrix is not None:
+            return self.shared_matrix
+        if not self.sorted_lats or not self.sorted_lons:
+            raise ValueError("No se pudo ensamblar la matriz de terreno.")
+
+        start_time = time.perf_counter()
+        handle = SharedTerrainMatrix.create(self.matrix_shape, name=name, lock=lock)
+        try:
+            if isinstance(self.full_terrain_matrix, np.ndarray):
+                handle.matrix[...] = self.full_terrain_matrix
+            else:
+                self._assemble_preallocated(max(1, self.parallel_workers), out=handle.matrix)
+        except Exception:
+            handle.close(force_unlink=True)
+            raise
+        self.shared_matrix = handle
+        self.full_terrain_matrix = handle.matrix
+        self.pyramid_cache.clear()
+        print(f"Matriz de terreno publicada en memoria compartida '{handle.name}': "
+              f"{handle.matrix.shape} en {time.perf_counter() - start_time:.2f}s")
+        self.full_terrain_matrix_loaded.emit()
+        return handle
+
+    def attach_shared_matrix(self, name: str, lock=None):
+        """Usa como matriz de terreno la publicada en memoria compartida con ``name``."""
+        handle = SharedTerrainMatrix.attach(name, lock)
+        if handle.matrix.shape != tuple(self.matrix_shape):
+            handle.close()
+            raise ValueError(f"La matriz compartida '{name}' tiene forma {handle.matrix.shape}, "
+                             f"se esperaba {tuple(self.matrix_shape)}.")
+        self.release_shared_matrix()
+        self.shared_matrix = handle
+        self.full_terrain_matrix = handle.matrix
+        self.pyramid_cache.clear()
+        self.full_terrain_matrix_loaded.emit()
+        return self.full_terrain_matrix
+
+    def release_shared_matrix(self, force_unlink: bool = False):
+        """Suelta la matriz compartida; el segmento se elimina al liberar la última referencia."""
+        if self.shared_matrix is None:
+            return
+        self.full_terrain_matrix = None
+        self.pyramid_cache.clear()
+        handle, self.shared_matrix = self.shared_matrix, None
+        handle.close(force_unlink=force_unlink)
+
     def coords_to_indices(self, lat: float, lon: float) -> tuple[int, int]:
         """
         Convierte coordenadas (lat, lon) a índices (row, col) en la matriz de terreno.
@@ -137,36 +558,207 @@ class TerrainDataLoader(QObject):
                 self.lon_min_matrix <= lon < self.lon_max_matrix + 1):
             raise ValueError(f"Coordenadas ({lat}, {lon}) fuera del rango de datos disponibles.")
 
-        lat_block_origin = int(math.floor(lat)) if lat >= 0 else int(math.ceil(lat))
-        lon_block_origin = int(math.floor(lon)) if lon >= 0 else int(math.ceil(lon))
-        lat_block_idx = self.sorted_lats.index(lat_block_origin)
-        lon_block_idx = self.sorted_lons.index(lon_block_origin)
+        rows, cols = self.coords_to_indices_batch(lat, lon)
+        return int(rows), int(cols)
+
+    def coords_to_indices_batch(self, lats, lons) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Convierte arreglos de coordenadas a índices (row, col) en una sola pasada de NumPy.
+
+        Args:
+            lats: Latitudes en grados decimales (escalar o arreglo).
+            lons: Longitudes en grados decimales, con forma compatible con ``lats``.
+
+        Returns:
+            tuple: Arreglos int64 de filas y columnas (celda más cercana), con la
+            forma de la difusión de ``lats`` y ``lons``.
+        """
+        rows, cols = self._coords_to_fractional_indices(lats, lons)
+        rows = np.clip(np.floor(rows + 0.5).astype(np.int64), 0, self.matrix_shape[0] - 1)
+        cols = np.clip(np.floor(cols + 0.5).astype(np.int64), 0, self.matrix_shape[1] - 1)
+        return rows, cols
+
+    def indices_to_coords_batch(self, rows, cols) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Convierte índices (row, col) del mosaico, posiblemente fraccionarios, a (lat, lon).
+
+        Es la inversa de ``_coords_to_fractional_indices``; los índices fuera
+        de la matriz se extrapolan desde el bloque más cercano.
+        """
+        span = self.hgt_resolution - 1
+        rows = np.asarray(rows, dtype=np.float64)
+        cols = np.asarray(cols, dtype=np.float64)
+        block_rows = np.clip(np.floor(rows / span).astype(np.int64), 0, len(self.sorted_lats) - 1)
+        block_cols = np.clip(np.floor(cols / span).astype(np.int64), 0, len(self.sorted_lons) - 1)
+        lats = np.asarray(self.sorted_lats)[block_rows] + 1 - (rows - self._row_offsets[block_rows]) / span
+        lons = np.asarray(self.sorted_lons)[block_cols] + (cols - self._col_offsets[block_cols]) / span
+        return lats, lons
+
+    def build_terrain_cache(self, cache_path: str = None):
+        """
+        Genera la caché pre-teselada de terreno a partir de los .hgt y pasa a usarla.
+        """
+        cache_path = Path(cache_path) if cache_path else self.cache_path
+        if cache_path is None:
+            raise ValueError("No se ha definido una ruta para la caché de terreno.")
+        if self.terrain_cache is not None:
+            self.terrain_cache.close()
+        build_terrain_cache(self.available_hgt_files, cache_path, self.hgt_resolution)
+        self.cache_path = cache_path
+        self.terrain_cache = open_terrain_cache(cache_path, self.available_hgt_files, self.hgt_resolution)
+        self.tile_cache.clear()
+
+    def get_pyramid_level(self, level: int, mode: str = PYRAMID_MODE):
+        """
+        Devuelve el nivel ``level`` de la pirámide multirresolución del mosaico.
+
+        El nivel 0 es la matriz completa; el nivel ``k`` reduce cada bloque de
+        ``2**k x 2**k`` celdas a una sola. La celda ``r`` del nivel ``k`` está
+        centrada en la fila ``r * 2**k + (2**k - 1) / 2`` de la matriz completa.
+
+        Los niveles son perezosos: mientras ``2**k`` divide el lado de un
+        bloque .hgt, el nivel es un ``TerrainMosaic`` de bloques reducidos
+        (cada bloque se reduce una sola vez y queda en ``pyramid_cache``), y
+        los niveles superiores reducen al vuelo la ventana pedida del nivel
+        anterior. Así, una vista solo reduce los bloques que toca.
+        """
+        if self.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        if mode not in PYRAMID_MODES:
+            raise ValueError(f"Modo de reducción desconocido: {mode}")
+        if level == 0:
+            return self.full_terrain_matrix
+        key = (level, mode)
+        pyramid_level = self._pyramid.get(key)
+        if pyramid_level is None:
+            if level <= self._max_tile_pyramid_level():
+                pyramid_level = TerrainMosaic(
+                    lambda i, j: self._get_pyramid_block(i, j, level, mode),
+                    len(self.sorted_lats), len(self.sorted_lons),
+                    (self.hgt_resolution - 1) // 2 ** level + 1
+                )
+            else:
+                pyramid_level = DownsampledView(self.get_pyramid_level(level - 1, mode), mode)
+            self._pyramid[key] = pyramid_level
+        return pyramid_level
+
+    def get_tile_cache_stats(self) -> dict:
+        """Devuelve los contadores de la caché de bloques (aciertos, fallos, memoria)."""
+        return self.tile_cache.stats()
 
-        relative_lat = lat - lat_block_origin
-        if lat_block_origin < 0:
-            relative_lat = 1 - (lat - lat_block_origin)
-        relative_lon = lon - lon_block_origin
+    def _gather(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Lee la matriz de terreno en pares (row, col) sin importar su representación."""
+        if isinstance(self.full_terrain_matrix, TerrainMosaic):
+            return self.full_terrain_matrix.take_points(rows, cols)
+        return self.full_terrain_matrix[rows, cols]
 
-        rows_in_block = self.hgt_resolution - (1 if lat_block_idx < len(self.sorted_lats) - 1 else 0)
-        cols_in_block = self.hgt_resolution - (1 if lon_block_idx < len(self.sorted_lons) - 1 else 0)
-        row_in_block = int(relative_lat * (rows_in_block - 1))
-        col_in_block = int(relative_lon * (cols_in_block - 1))
-        row_in_block = max(0, min(row_in_block, rows_in_block - 1))
-        col_in_block = max(0, min(col_in_block, cols_in_block - 1))
+    def _sample_bilinear(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Interpolación bilineal que ignora los vecinos vacíos (-32768).
+
+        Los pesos de los vecinos válidos se renormalizan; si los cuatro están
+        vacíos el resultado es NaN.
+        """
+        n_rows, n_cols = self.matrix_shape
+        r0 = np.clip(np.floor(rows).astype(np.int64), 0, n_rows - 1)
+        c0 = np.clip(np.floor(cols).astype(np.int64), 0, n_cols - 1)
+        fr = np.clip(rows - r0, 0.0, 1.0)
+        fc = np.clip(cols - c0, 0.0, 1.0)
+        r1 = np.minimum(r0 + 1, n_rows - 1)
+        c1 = np.minimum(c0 + 1, n_cols - 1)
 
-        global_row = sum(self.hgt_resolution - (1 if i < len(self.sorted_lats) - 1 else 0) for i in range(lat_block_idx)) + row_in_block
-        global_col = sum(self.hgt_resolution - (1 if j < len(self.sorted_lons) - 1 else 0) for j in range(lon_block_idx)) + col_in_block
-        global_row = max(0, min(global_row, self.full_terrain_matrix.shape[0] - 1))
-        global_col = max(0, min(global_col, self.full_terrain_matrix.shape[1] - 1))
+        weighted_sum = np.zeros(rows.shape, dtype=np.float64)
+        weight_total = np.zeros(rows.shape, dtype=np.float64)
+        for r, c, w in ((r0, c0, (1 - fr) * (1 - fc)), (r0, c1, (1 - fr) * fc),
+                        (r1, c0, fr * (1 - fc)), (r1, c1, fr * fc)):
+            values = self._gather(r, c)
+            valid = values != VOID_VALUE
+            weighted_sum += np.where(valid, w * values, 0.0)
+            weight_total += np.where(valid, w, 0.0)
 
-        return global_row, global_col
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(weight_total > 0, weighted_sum / weight_total, np.nan)
 
-    def get_elevation_at_coords(self, lat: float, lon: float) -> float:
+    def _sample_bicubic(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Interpolación bicúbica (Catmull-Rom) sobre la vecindad 4x4.
+
+        Los puntos con algún vecino vacío en la vecindad recurren a la
+        interpolación bilineal con renormalización.
+        """
+        n_rows, n_cols = self.matrix_shape
+        r_base = np.floor(rows).astype(np.int64)
+        c_base = np.floor(cols).astype(np.int64)
+        fr = rows - r_base
+        fc = cols - c_base
+
+        def catmull_rom_weights(t):
+            t2, t3 = t * t, t * t * t
+            return np.stack((
+                -0.5 * t3 + t2 - 0.5 * t,
+                1.5 * t3 - 2.5 * t2 + 1.0,
+                -1.5 * t3 + 2.0 * t2 + 0.5 * t,
+                0.5 * t3 - 0.5 * t2,
+            ), axis=-1)
+
+        row_weights = catmull_rom_weights(fr)
+        col_weights = catmull_rom_weights(fc)
+        offsets = np.arange(-1, 3)
+        neighbor_rows = np.clip(r_base[..., None] + offsets, 0, n_rows - 1)
+        neighbor_cols = np.clip(c_base[..., None] + offsets, 0, n_cols - 1)
+        values = self._gather(neighbor_rows[..., :, None], neighbor_cols[..., None, :])
+
+        has_void = np.any(values == VOID_VALUE, axis=(-2, -1))
+        result = np.einsum('...i,...ij,...j->...', row_weights, values.astype(np.float64), col_weights)
+        if np.any(has_void):
+            result[has_void] = self._sample_bilinear(rows[has_void], cols[has_void])
+        return result
+
+    def sample_elevations(self, lats, lons, method: str = 'bilinear') -> np.ndarray:
+        """
+        Obtiene elevaciones interpoladas para arreglos de coordenadas.
+
+        Args:
+            lats: Latitudes en grados decimales (escalar o arreglo).
+            lons: Longitudes en grados decimales, con forma compatible con ``lats``.
+            method: 'nearest', 'bilinear' o 'bicubic'.
+
+        Returns:
+            np.ndarray: Elevaciones en metros (float64) con la forma de la
+            difusión de ``lats`` y ``lons`` (0-d para escalares). Los puntos
+            sin datos válidos alrededor devuelven NaN.
+        """
+        if self.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        if method not in ('nearest', 'bilinear', 'bicubic'):
+            raise ValueError(f"Método de interpolación desconocido: {method}")
+
+        # Trabajar siempre con arreglos 1-D: los escalares darían resultados 0-d
+        # que no admiten asignación por máscara
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        shape = lats.shape
+        lats, lons = lats.reshape(-1), lons.reshape(-1)
+        if method == 'nearest':
+            rows_idx, cols_idx = self.coords_to_indices_batch(lats, lons)
+            values = self._gather(rows_idx, cols_idx).astype(np.float64)
+            values[values == VOID_VALUE] = np.nan
+        else:
+            rows, cols = self._coords_to_fractional_indices(lats, lons)
+            sampler = self._sample_bilinear if method == 'bilinear' else self._sample_bicubic
+            values = sampler(rows, cols)
+        return values.reshape(shape)
+
+    def get_elevation_at_coords(self, lat: float, lon: float, method: str = 'nearest') -> float:
         """
         Obtiene la elevación en metros para una latitud y longitud dadas.
+
+        ``method`` admite 'nearest' (celda más cercana), 'bilinear' o 'bicubic'.
         """
         if self.full_terrain_matrix is None:
             raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        if method != 'nearest':
+            elevation = float(self.sample_elevations(lat, lon, method))
+            return 0.0 if math.isnan(elevation) else elevation
         row, col = self.coords_to_indices(lat, lon)
         elevation = self.full_terrain_matrix[row, col]
         return 0.0 if elevation == -32768 else float(elevation)
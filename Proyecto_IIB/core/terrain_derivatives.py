@@ -0,0 +1,242 @@
+# core/terrain_derivatives.py
+"""
+Rásteres derivados del terreno: pendiente, orientación y sombreado del relieve.
+
+Las derivadas se calculan con el operador de Horn (diferencias finitas 3x3)
+sobre toda la ventana a la vez. ``TerrainDerivatives`` los guarda por bloque
+.hgt en disco (un .npz por bloque) y en una caché LRU en memoria; cada
+archivo recuerda la fecha y el tamaño del .hgt de origen y de sus vecinos
+(que aportan el borde del cálculo) y si se rellenaron sus vacíos, y se
+regenera si algo de esto cambia.
+"""
+
+import math
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from core.terrain_mosaic import VOID_VALUE
+from core.tile_cache import TileCache
+from config import (
+    DERIVED_CACHE_DIR, DERIVED_CACHE_MB, EARTH_RADIUS_M, HILLSHADE_AZIMUTH_DEG, HILLSHADE_ALTITUDE_DEG
+)
+
+DERIVED_PRODUCTS = ('slope', 'aspect', 'hillshade')
+DERIVED_FORMAT_VERSION = 3
+
+
+def slope_aspect(elevation: np.ndarray, cell_ns_m: float, cell_ew_m) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pendiente y orientación de una ventana de elevaciones (fila 0 = norte).
+
+    Args:
+        elevation: Elevaciones en metros (float, NaN en los vacíos).
+        cell_ns_m: Tamaño de celda norte-sur en metros.
+        cell_ew_m: Tamaño de celda este-oeste en metros; escalar o arreglo
+            ``(n_filas, 1)`` para escalar la longitud fila a fila.
+
+    Returns:
+        tuple: Pendiente en grados y orientación (dirección de bajada, en
+        grados desde el norte en sentido horario), ambas float32. Las celdas
+        vecinas a un vacío quedan en NaN.
+    """
+    z = np.pad(np.asarray(elevation, dtype=np.float32), 1, mode='edge')
+    a, b, c = z[:-2, :-2], z[:-2, 1:-1], z[:-2, 2:]
+    d, f = z[1:-1, :-2], z[1:-1, 2:]
+    g, h, i = z[2:, :-2], z[2:, 1:-1], z[2:, 2:]
+    dz_east = ((c + 2 * f + i) - (a + 2 * d + g)) / (8.0 * np.asarray(cell_ew_m, dtype=np.float32))
+    dz_north = ((a + 2 * b + c) - (g + 2 * h + i)) / np.float32(8.0 * cell_ns_m)
+    slope = np.degrees(np.arctan(np.hypot(dz_east, dz_north)))
+    aspect = np.mod(np.degrees(np.arctan2(-dz_east, -dz_north)), 360.0)
+    return slope.astype(np.float32), aspect.astype(np.float32)
+
+
+def hillshade(slope_deg: np.ndarray, aspect_deg: np.ndarray,
+              sun_azimuth_deg: float = HILLSHADE_AZIMUTH_DEG,
+              sun_altitude_deg: float = HILLSHADE_ALTITUDE_DEG) -> np.ndarray:
+    """Sombreado del relieve (0-255, uint8) para una posición del sol dada; 0 en los vacíos."""
+    zenith = math.radians(90.0 - sun_altitude_deg)
+    slope = np.radians(slope_deg)
+    shade = (math.cos(zenith) * np.cos(slope) +
+             math.sin(zenith) * np.sin(slope) * np.cos(np.radians(sun_azimuth_deg - aspect_deg)))
+    shade = np.nan_to_num(np.clip(shade, 0.0, 1.0), nan=0.0)
+    return np.rint(shade * 255).astype(np.uint8)
+
+
+class TerrainDerivatives:
+    """
+    Pendiente, orientación y sombreado del mosaico, cacheados por bloque .hgt.
+
+    Cada bloque se calcula con un borde de una celda tomado de sus vecinos,
+    de modo que el resultado no tiene costuras entre bloques.
+    """
+
+    def __init__(self, terrain_loader, cache_dir=DERIVED_CACHE_DIR, memory_mb: float = DERIVED_CACHE_MB,
+                 sun_azimuth_deg: float = HILLSHADE_AZIMUTH_DEG,
+                 sun_altitude_deg: float = HILLSHADE_ALTITUDE_DEG):
+        self.terrain_loader = terrain_loader
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.sun_azimuth_deg = float(sun_azimuth_deg)
+        self.sun_altitude_deg = float(sun_altitude_deg)
+        self.memory_cache = TileCache(memory_mb)
+
+    # --- Métodos privados ---
+
+    def _tile_path(self, lat_int: int, lon_int: int) -> Path:
+        return self.cache_dir / f"derived_{lat_int}_{lon_int}.npz"
+
+    def _source_signature(self, lat_int: int, lon_int: int) -> np.ndarray:
+        """
+        Fecha y tamaño del .hgt del bloque y de sus vecinos existentes.
+
+        Los vecinos aportan el borde de una celda del cálculo, así que un
+        cambio en cualquiera de ellos también invalida el bloque.
+        """
+        hgt_files = self.terrain_loader.available_hgt_files
+        signature = []
+        for d_lat in (-1, 0, 1):
+            for d_lon in (-1, 0, 1):
+                filepath = hgt_files.get((lat_int + d_lat, lon_int + d_lon))
+                if filepath is not None:
+                    st = os.stat(filepath)
+                    signature.append((lat_int + d_lat, lon_int + d_lon, float(st.st_mtime), float(st.st_size)))
+        return np.array(signature, dtype=np.float64).reshape(-1, 4)
+
+    def _read_disk(self, lat_int: int, lon_int: int):
+        """Lee los productos del bloque desde disco si el archivo está al día."""
+        path = self._tile_path(lat_int, lon_int)
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path) as npz:
+                fresh = (int(npz['format_version']) == DERIVED_FORMAT_VERSION and
+                         np.array_equal(npz['source_signature'], self._source_signature(lat_int, lon_int)) and
+                         bool(npz['void_filled']) == bool(self.terrain_loader.fill_voids) and
+                         float(npz['sun_azimuth_deg']) == self.sun_azimuth_deg and
+                         float(npz['sun_altitude_deg']) == self.sun_altitude_deg)
+                if not fresh:
+                    return None
+                return {name: npz[name] for name in DERIVED_PRODUCTS}
+        except Exception as e:
+            print(f"No se pudo leer {path}: {e}")
+            return None
+
+    def _write_disk(self, lat_int: int, lon_int: int, products: dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._tile_path(lat_int, lon_int)
+        # Temporal con nombre único: varios procesos pueden calcular el mismo bloque a la vez
+        f = tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=path.name + '.', suffix='.tmp', delete=False)
+        try:
+            with f:
+                # Sin comprimir: leer del disco debe costar menos que recalcular
+                np.savez(f, format_version=np.array(DERIVED_FORMAT_VERSION),
+                         source_signature=self._source_signature(lat_int, lon_int),
+                         void_filled=np.array(bool(self.terrain_loader.fill_voids)),
+                         sun_azimuth_deg=np.array(self.sun_azimuth_deg),
+                         sun_altitude_deg=np.array(self.sun_altitude_deg), **products)
+            os.replace(f.name, path)
+        except BaseException:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+    def _compute_block(self, i: int, j: int) -> dict:
+        """Calcula los productos del bloque (i, j) con un borde de una celda de sus vecinos."""
+        loader = self.terrain_loader
+        matrix = loader.full_terrain_matrix
+        row_start, n_rows = loader._block_extent(i, len(loader.sorted_lats))
+        col_start, n_cols = loader._block_extent(j, len(loader.sorted_lons))
+        top, left = max(0, row_start - 1), max(0, col_start - 1)
+        bottom = min(matrix.shape[0], row_start + n_rows + 1)
+        right = min(matrix.shape[1], col_start + n_cols + 1)
+
+        window = np.asarray(matrix[top:bottom, left:right]).astype(np.float32)
+        window[window == VOID_VALUE] = np.nan
+
+        # Latitud de cada fila para escalar el paso este-oeste
+        span = loader.hgt_resolution - 1
+        lat_top = loader.sorted_lats[i] + 1 - (top - row_start) / span
+        row_lats = lat_top - np.arange(window.shape[0]) / span
+        cell_ns_m = EARTH_RADIUS_M * math.pi / 180.0 / span
+        cell_ew_m = (cell_ns_m * np.cos(np.radians(row_lats)))[:, None]
+
+        slope, aspect = slope_aspect(window, cell_ns_m, cell_ew_m)
+        inner = (slice(row_start - top, row_start - top + n_rows), slice(col_start - left, col_start - left + n_cols))
+        slope, aspect = np.ascontiguousarray(slope[inner]), np.ascontiguousarray(aspect[inner])
+        return {
+            'slope': slope,
+            'aspect': aspect,
+            'hillshade': hillshade(slope, aspect, self.sun_azimuth_deg, self.sun_altitude_deg),
+        }
+
+    # --- Métodos públicos ---
+
+    def get_block(self, i: int, j: int) -> dict:
+        """
+        Devuelve ``{'slope', 'aspect', 'hillshade'}`` del bloque (i, j) del mosaico.
+
+        Busca primero en memoria, luego en disco y solo en último caso
+        calcula. Devuelve None si el bloque no tiene archivo .hgt.
+        """
+        loader = self.terrain_loader
+        if loader.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        key = (loader.sorted_lats[i], loader.sorted_lons[j])
+        if key not in loader.available_hgt_files:
+            return None
+
+        products = {name: self.memory_cache.get(key + (name,)) for name in DERIVED_PRODUCTS}
+        if any(product is None for product in products.values()):
+            products = self._read_disk(*key) if self.cache_dir else None
+            if products is None:
+                products = self._compute_block(i, j)
+                if self.cache_dir:
+                    try:
+                        self._write_disk(*key, products)
+                    except Exception as e:
+                        print(f"No se pudieron guardar los rásteres derivados en {self.cache_dir}: {e}")
+            for name, product in products.items():
+                self.memory_cache.put(key + (name,), product)
+        return products
+
+    def get_window(self, row_min: int, row_max: int, col_min: int, col_max: int,
+                   product: str = 'hillshade') -> np.ndarray:
+        """
+        Devuelve un producto derivado para la ventana ``[row_min:row_max, col_min:col_max]``.
+
+        La ventana se arma a partir de los bloques cacheados que toca; las
+        zonas sin archivo .hgt quedan en NaN (0 para el sombreado).
+        """
+        if product not in DERIVED_PRODUCTS:
+            raise ValueError(f"Producto derivado desconocido: {product}")
+        loader = self.terrain_loader
+        if loader.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        row_min, col_min = max(0, row_min), max(0, col_min)
+        row_max = min(loader.matrix_shape[0], row_max)
+        col_max = min(loader.matrix_shape[1], col_max)
+
+        dtype = np.uint8 if product == 'hillshade' else np.float32
+        out = np.full((max(0, row_max - row_min), max(0, col_max - col_min)),
+                      0 if product == 'hillshade' else np.nan, dtype=dtype)
+        span = loader.hgt_resolution - 1
+        n_lats, n_lons = len(loader.sorted_lats), len(loader.sorted_lons)
+        for i in range(row_min // span, min(n_lats, (row_max - 1) // span + 1)):
+            row_start, n_rows = loader._block_extent(i, n_lats)
+            r0, r1 = max(row_min, row_start), min(row_max, row_start + n_rows)
+            for j in range(col_min // span, min(n_lons, (col_max - 1) // span + 1)):
+                col_start, n_cols = loader._block_extent(j, n_lons)
+                c0, c1 = max(col_min, col_start), min(col_max, col_start + n_cols)
+                if r0 >= r1 or c0 >= c1:
+                    continue
+                products = self.get_block(i, j)
+                if products is None:
+                    continue
+                out[r0 - row_min:r1 - row_min, c0 - col_min:c1 - col_min] = \
+                    products[product][r0 - row_start:r1 - row_start, c0 - col_start:c1 - col_start]
+        return out
+
+    def get_mosaic(self, product: str = 'hillshade') -> np.ndarray:
+        """Devuelve el producto derivado para todo el mosaico."""
+        return self.get_window(0, self.terrain_loader.matrix_shape[0], 0, self.terrain_loader.matrix_shape[1], product)
@@ -0,0 +1,163 @@
+# core/terrain_mosaic.py
+"""
+Mosaico de terreno perezoso respaldado por archivos .hgt mapeados en memoria.
+"""
+
+import numpy as np
+
+VOID_VALUE = -32768
+
+
+class TerrainMosaic:
+    """
+    Vista de solo lectura del mosaico de bloques .hgt.
+
+    Se comporta como la matriz completa ensamblada (``shape``, ``dtype``,
+    indexado con enteros y slices con paso) pero solo lee los bloques que
+    intersecan la ventana solicitada. Los bordes compartidos entre bloques
+    se recortan igual que en el ensamblado completo: el bloque ``i`` aporta
+    las filas ``[i*(res-1), (i+1)*(res-1))`` y solo el último bloque conserva
+    su fila (o columna) final.
+    """
+
+    def __init__(self, block_getter, n_block_rows: int, n_block_cols: int, hgt_resolution: int):
+        """
+        Args:
+            block_getter: Función ``(i, j) -> np.ndarray | None`` que devuelve el
+                bloque completo (res x res) en la fila ``i`` y columna ``j`` del
+                mosaico, o ``None`` si no hay archivo para esa posición.
+            n_block_rows: Número de bloques en sentido norte-sur.
+            n_block_cols: Número de bloques en sentido oeste-este.
+            hgt_resolution: Puntos por lado de cada bloque.
+        """
+        self._get_block = block_getter
+        self.n_block_rows = n_block_rows
+        self.n_block_cols = n_block_cols
+        self.hgt_resolution = hgt_resolution
+        self._block_span = hgt_resolution - 1
+        self.shape = (n_block_rows * self._block_span + 1, n_block_cols * self._block_span + 1)
+        self.dtype = np.dtype(np.int16)
+
+    # --- Propiedades tipo ndarray ---
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def size(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self[:, :]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    # --- Indexado ---
+
+    def _normalize_axis_key(self, key, axis: int):
+        """Convierte un índice entero o slice en (start, count, step, es_escalar)."""
+        n = self.shape[axis]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(n)
+            count = len(range(start, stop, step))
+            return start, count, step, False
+        try:
+            index = int(key)
+        except TypeError:
+            raise TypeError(f"Índice no soportado por TerrainMosaic: {key!r}") from None
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(f"Índice {key} fuera de rango para el eje {axis} de tamaño {n}")
+        return index, 1, 1, True
+
+    def _axis_segments(self, start: int, count: int, step: int, n_blocks: int):
+        """
+        Divide una progresión aritmética de índices globales en tramos por bloque.
+
+        Devuelve tuplas ``(bloque, slice_salida, slice_local)``.
+        """
+        if count == 0:
+            return []
+        indices = start + step * np.arange(count)
+        blocks = np.minimum(indices // self._block_span, n_blocks - 1)
+        # Los índices son monótonos, por lo que cada bloque ocupa un tramo contiguo
+        boundaries = np.flatnonzero(np.diff(blocks)) + 1
+        run_starts = np.concatenate(([0], boundaries))
+        run_stops = np.concatenate((boundaries, [count]))
+
+        segments = []
+        for run_start, run_stop in zip(run_starts, run_stops):
+            block = int(blocks[run_start])
+            local_first = int(indices[run_start]) - block * self._block_span
+            local_last = int(indices[run_stop - 1]) - block * self._block_span
+            local_stop = local_last + (1 if step > 0 else -1)
+            local_slice = slice(local_first, local_stop if local_stop >= 0 else None, step)
+            segments.append((block, slice(int(run_start), int(run_stop)), local_slice))
+        return segments
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        if len(key) != 2:
+            raise IndexError("TerrainMosaic solo admite indexado bidimensional.")
+
+        row_start, row_count, row_step, row_scalar = self._normalize_axis_key(key[0], 0)
+        col_start, col_count, col_step, col_scalar = self._normalize_axis_key(key[1], 1)
+
+        out = np.full((row_count, col_count), VOID_VALUE, dtype=self.dtype)
+        row_segments = self._axis_segments(row_start, row_count, row_step, self.n_block_rows)
+        col_segments = self._axis_segments(col_start, col_count, col_step, self.n_block_cols)
+
+        for block_row, out_rows, local_rows in row_segments:
+            for block_col, out_cols, local_cols in col_segments:
+                block = self._get_block(block_row, block_col)
+                if block is not None:
+                    out[out_rows, out_cols] = block[local_rows, local_cols]
+
+        if row_scalar and col_scalar:
+            return out[0, 0]
+        if row_scalar:
+            return out[0]
+        if col_scalar:
+            return out[:, 0]
+        return out
+
+    def take_points(self, rows, cols) -> np.ndarray:
+        """
+        Lee elevaciones en posiciones dispersas (indexado avanzado por pares).
+
+        Equivale a ``matriz[rows, cols]`` con arreglos de enteros, agrupando
+        los puntos por bloque para leer cada bloque una sola vez.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        rows, cols = np.broadcast_arrays(rows, cols)
+        out = np.full(rows.shape, VOID_VALUE, dtype=self.dtype)
+        if rows.size == 0:
+            return out
+        if (rows.min() < 0 or rows.max() >= self.shape[0] or
+                cols.min() < 0 or cols.max() >= self.shape[1]):
+            raise IndexError("Índices fuera del mosaico de terreno.")
+
+        flat_rows, flat_cols, flat_out = rows.ravel(), cols.ravel(), out.reshape(-1)
+        block_rows = np.minimum(flat_rows // self._block_span, self.n_block_rows - 1)
+        block_cols = np.minimum(flat_cols // self._block_span, self.n_block_cols - 1)
+        block_ids = block_rows * self.n_block_cols + block_cols
+        order = np.argsort(block_ids, kind='stable')
+        sorted_ids = block_ids[order]
+        boundaries = np.flatnonzero(np.diff(sorted_ids)) + 1
+        for group in np.split(order, boundaries):
+            block_row, block_col = divmod(int(block_ids[group[0]]), self.n_block_cols)
+            block = self._get_block(block_row, block_col)
+            if block is not None:
+                flat_out[group] = block[flat_rows[group] - block_row * self._block_span,
+                                        flat_cols[group] - block_col * self._block_span]
+        return out
@@ -0,0 +1,156 @@
+# core/terrain_pyramid.py
+"""
+Reducción de resolución del terreno para la pirámide multirresolución (LOD).
+"""
+
+import numpy as np
+
+from core.terrain_mosaic import VOID_VALUE
+
+PYRAMID_MODES = ('mean', 'max')
+
+
+def block_reduce(matrix: np.ndarray, factor: int, mode: str = 'mean') -> np.ndarray:
+    """
+    Reduce una matriz de elevaciones por bloques de ``factor x factor``.
+
+    Los valores vacíos (-32768) no participan: ``'mean'`` promedia solo los
+    valores válidos y ``'max'`` conserva el máximo local (picos). Un bloque
+    completamente vacío sigue siendo vacío. Las dimensiones que no son
+    múltiplo de ``factor`` se completan replicando el borde.
+
+    Args:
+        matrix: Matriz int16 de elevaciones.
+        factor: Lado del bloque en celdas.
+        mode: 'mean' (promedio) o 'max' (preserva máximos).
+
+    Returns:
+        np.ndarray: Matriz int16 de forma ``(ceil(h/factor), ceil(w/factor))``.
+    """
+    if mode not in PYRAMID_MODES:
+        raise ValueError(f"Modo de reducción desconocido: {mode}")
+    rows, cols = matrix.shape
+    pad_rows, pad_cols = -rows % factor, -cols % factor
+    if pad_rows or pad_cols:
+        matrix = np.pad(matrix, ((0, pad_rows), (0, pad_cols)), mode='edge')
+
+    # Se acumula sobre las factor x factor submatrices con paso ``factor``:
+    # mucho más rápido que reducir un arreglo 4D con ejes internos pequeños.
+    offsets = [(a, b) for a in range(factor) for b in range(factor)]
+    if mode == 'max':
+        # -32768 es el mínimo de int16, así que el máximo ya ignora los vacíos
+        out = matrix[::factor, ::factor].copy()
+        for a, b in offsets[1:]:
+            np.maximum(out, matrix[a::factor, b::factor], out=out)
+        return out
+
+    shape = (matrix.shape[0] // factor, matrix.shape[1] // factor)
+    sums = np.zeros(shape, dtype=np.float32)
+    counts = np.zeros(shape, dtype=np.int32)
+    for a, b in offsets:
+        sub = matrix[a::factor, b::factor]
+        valid = sub != VOID_VALUE
+        np.add(sums, sub, out=sums, where=valid)
+        counts += valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.rint(sums / counts)
+    return np.where(counts > 0, means, VOID_VALUE).astype(np.int16)
+
+
+def downsample_2x(matrix: np.ndarray, mode: str = 'mean') -> np.ndarray:
+    """Reduce una matriz a la mitad de resolución (``block_reduce`` con bloques de 2x2)."""
+    return block_reduce(matrix, 2, mode)
+
+
+def decimation_error(matrix: np.ndarray, factor: int, reduced: np.ndarray) -> dict:
+    """
+    Error de una matriz reducida respecto a la original.
+
+    ``peak_error_*`` compara, para cada bloque de ``factor x factor``, el
+    máximo original con el valor del vértice que lo representa: es la altura
+    de cumbre que se pierde en la silueta del horizonte. ``surface_error_mean_m``
+    es la diferencia media entre cada celda y el vértice de su bloque. Los
+    vacíos no cuentan.
+
+    Returns:
+        dict: ``vertices``, ``peak_error_max_m``, ``peak_error_mean_m`` y
+        ``surface_error_mean_m``.
+    """
+    # Relleno con vacíos para que las celdas añadidas no cuenten en el error
+    rows, cols = matrix.shape
+    padded = np.pad(matrix, ((0, -rows % factor), (0, -cols % factor)), constant_values=VOID_VALUE)
+    reduced_valid = reduced != VOID_VALUE
+
+    block_max = block_reduce(padded, factor, 'max')
+    loss = (block_max.astype(np.int32) - reduced)[(block_max != VOID_VALUE) & reduced_valid]
+
+    surface_sum, n_valid = 0.0, 0
+    for a in range(factor):
+        for b in range(factor):
+            sub = padded[a::factor, b::factor]
+            valid = (sub != VOID_VALUE) & reduced_valid
+            surface_sum += float(np.abs(sub.astype(np.int32) - reduced).sum(where=valid))
+            n_valid += int(np.count_nonzero(valid))
+    return {
+        'vertices': int(reduced.size),
+        'peak_error_max_m': float(loss.max()) if loss.size else 0.0,
+        'peak_error_mean_m': float(loss.mean()) if loss.size else 0.0,
+        'surface_error_mean_m': surface_sum / n_valid if n_valid else 0.0,
+    }
+
+
+def decimation_tradeoff(matrix: np.ndarray, factors=(1, 2, 4, 8, 16),
+                        modes=('stride',) + PYRAMID_MODES) -> list[dict]:
+    """
+    Tabla de vértices frente a error de silueta para varios pasos y modos.
+
+    ``'stride'`` es el submuestreo clásico ``matrix[::f, ::f]``; los demás
+    modos son los de ``block_reduce``.
+    """
+    rows = []
+    for factor in factors:
+        for mode in modes:
+            reduced = matrix[::factor, ::factor] if mode == 'stride' else block_reduce(matrix, factor, mode)
+            rows.append({'factor': factor, 'mode': mode, **decimation_error(matrix, factor, reduced)})
+    return rows
+
+
+class DownsampledView:
+    """
+    Vista perezosa de ``downsample_2x(source)`` para ventanas rectangulares.
+
+    Cada ventana se calcula reduciendo solo la ventana correspondiente (el
+    doble de grande) de ``source``, que puede ser una matriz, un
+    ``TerrainMosaic`` u otro ``DownsampledView``. El resultado coincide con
+    reducir la fuente completa.
+    """
+
+    def __init__(self, source, mode: str = 'mean'):
+        self.source = source
+        self.mode = mode
+        rows, cols = source.shape
+        self.shape = ((rows + 1) // 2, (cols + 1) // 2)
+        self.dtype = np.dtype(np.int16)
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self[:, :]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    def __getitem__(self, key):
+        if not (isinstance(key, tuple) and len(key) == 2 and all(isinstance(k, slice) for k in key)):
+            raise TypeError("DownsampledView solo admite ventanas de la forma [filas, columnas] con slices.")
+        bounds = []
+        for axis_key, n in zip(key, self.shape):
+            start, stop, step = axis_key.indices(n)
+            if step != 1:
+                raise TypeError("DownsampledView no admite slices con paso.")
+            bounds.append((start, max(start, stop)))
+        (row_start, row_stop), (col_start, col_stop) = bounds
+        window = np.asarray(self.source[2 * row_start:2 * row_stop, 2 * col_start:2 * col_stop])
+        if window.size == 0:
+            return np.empty((row_stop - row_start, col_stop - col_start), dtype=np.int16)
+        return downsample_2x(window, self.mode)
@@ -0,0 +1,97 @@
+# core/tile_cache.py
+"""
+Caché LRU de bloques de elevación decodificados con presupuesto en bytes.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TileCache:
+    """
+    Caché LRU de bloques .hgt indexada por ``(lat_int, lon_int)``.
+
+    Mantiene el total de bytes residentes por debajo de ``max_bytes``
+    expulsando primero los bloques usados hace más tiempo. Es segura entre
+    hilos para poder compartirse con los hilos de carga.
+    """
+
+    def __init__(self, max_megabytes: float):
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+    def __contains__(self, key) -> bool:
+        return key in self._tiles
+
+    def get(self, key):
+        """Devuelve el bloque cacheado (marcándolo como reciente) o None."""
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def peek(self, key):
+        """Devuelve el bloque cacheado o None, sin contar acierto/fallo ni cambiar su antigüedad."""
+        with self._lock:
+            return self._tiles.get(key)
+
+    def put(self, key, tile: np.ndarray):
+        """
+        Inserta un bloque y expulsa los menos recientes hasta respetar el presupuesto.
+
+        Los bloques más grandes que el presupuesto completo no se almacenan.
+        """
+        if tile.nbytes > self.max_bytes:
+            return
+        tile.flags.writeable = False
+        with self._lock:
+            previous = self._tiles.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            while self._tiles and self.current_bytes + tile.nbytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+            self._tiles[key] = tile
+            self.current_bytes += tile.nbytes
+
+    def discard(self, key):
+        """Elimina un bloque de la caché si está presente."""
+        with self._lock:
+            tile = self._tiles.pop(key, None)
+            if tile is not None:
+                self.current_bytes -= tile.nbytes
+
+    def clear(self):
+        """Vacía la caché conservando los contadores."""
+        with self._lock:
+            self._tiles.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Resumen de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'tiles': len(self._tiles),
+                'size_mb': self.current_bytes / (1024 * 1024),
+                'budget_mb': self.max_bytes / (1024 * 1024),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,205 @@
+# core/view_cache.py
+"""
+Caché de vistas ya construidas (malla del terreno y sus estadísticas).
+
+Las vistas se indexan por la celda del mosaico donde está el observador,
+el radio, la cuña de visión y los parámetros de reducción, de modo que
+volver a un destino ya visitado no repite el recorte, la proyección ni la
+construcción de la malla. La caché en memoria es LRU con presupuesto en
+bytes; opcionalmente las vistas también se guardan en disco (un .npz por
+vista) y se descartan si cambia algún .hgt que las cubra.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pyvista as pv
+
+from config import VIEW_CACHE_MB, VIEW_CACHE_DIR, EARTH_RADIUS_M
+
+VIEW_CACHE_FORMAT_VERSION = 1
+STAGE_STATS = ('surface_view', 'min_elevation_m', 'max_elevation_m', 'observer_height_m',
+               'terrain_height_m', 'decimation', 'culling', 'preview')
+
+
+def stage_nbytes(stage: dict) -> int:
+    """Memoria aproximada que ocupa una vista (su malla) en bytes."""
+    return int(stage['surface'].actual_memory_size) * 1024
+
+
+class ViewCache:
+    """
+    Caché LRU de vistas con presupuesto en bytes y copia opcional en disco.
+
+    Las vistas más grandes que el presupuesto completo no se guardan en
+    memoria. Es segura entre hilos.
+    """
+
+    def __init__(self, max_megabytes: float = VIEW_CACHE_MB, cache_dir=VIEW_CACHE_DIR):
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._views = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    # --- Métodos privados ---
+
+    def _put_memory(self, key, stage: dict):
+        nbytes = stage_nbytes(stage)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._views:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._views[key]
+            while self._views and self.current_bytes + nbytes > self.max_bytes:
+                evicted_key, _ = self._views.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(evicted_key)
+                self.evictions += 1
+            self._views[key] = stage
+            self._sizes[key] = nbytes
+            self.current_bytes += nbytes
+
+    def _view_path(self, key) -> Path:
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+        return self.cache_dir / f"view_{digest}.npz"
+
+    @staticmethod
+    def _source_signature(terrain_loader, lat: float, lon: float, radius_km: float) -> list:
+        """Fecha y tamaño de cada .hgt que cubre el radio de vista."""
+        radius_deg = radius_km / (EARTH_RADIUS_M * math.pi / 180.0 / 1000.0)
+        lon_radius_deg = radius_deg / max(math.cos(math.radians(lat)), 1e-6)
+        signature = []
+        for lat_int in range(math.floor(lat - radius_deg), math.floor(lat + radius_deg) + 1):
+            for lon_int in range(math.floor(lon - lon_radius_deg), math.floor(lon + lon_radius_deg) + 1):
+                filepath = terrain_loader.available_hgt_files.get((lat_int, lon_int))
+                if filepath is not None:
+                    st = os.stat(filepath)
+                    signature.append([lat_int, lon_int, float(st.st_mtime), int(st.st_size)])
+        return signature
+
+    def _read_disk(self, key, signature: list):
+        path = self._view_path(key)
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path) as npz:
+                meta = json.loads(str(npz['meta']))
+                if (meta['format_version'] != VIEW_CACHE_FORMAT_VERSION or meta['key'] != repr(key) or
+                        meta['source_signature'] != signature):
+                    return None
+                if 'dimensions' in npz:
+                    surface = pv.StructuredGrid()
+                    surface.points = npz['points']
+                    surface.dimensions = tuple(int(d) for d in npz['dimensions'])
+                else:
+                    surface = pv.UnstructuredGrid({pv.CellType.QUAD: npz['quads']}, npz['points'])
+                surface["elevacion_normalizada"] = npz['elevacion_normalizada']
+        except Exception as e:
+            print(f"No se pudo leer {path}: {e}")
+            return None
+        stage = {name: meta['stats'][name] for name in STAGE_STATS}
+        if stage['surface_view'] is not None:
+            stage['surface_view'] = tuple(stage['surface_view'])
+        stage['surface'] = surface
+        return stage
+
+    def _write_disk(self, key, signature: list, stage: dict):
+        surface = stage['surface']
+        arrays = {'points': np.asarray(surface.points),
+                  'elevacion_normalizada': np.asarray(surface["elevacion_normalizada"])}
+        if isinstance(surface, pv.StructuredGrid):
+            arrays['dimensions'] = np.array(surface.dimensions)
+        else:
+            arrays['quads'] = surface.cells_dict[pv.CellType.QUAD]
+        meta = {
+            'format_version': VIEW_CACHE_FORMAT_VERSION,
+            'key': repr(key),
+            'source_signature': signature,
+            'stats': {name: stage[name] for name in STAGE_STATS},
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._view_path(key)
+        # Temporal único por escritura: dos hilos pueden guardar la misma vista a la vez
+        f = tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=path.name + '.', suffix='.tmp', delete=False)
+        try:
+            with f:
+                np.savez(f, meta=np.array(json.dumps(meta, default=lambda value: value.item())), **arrays)
+            os.replace(f.name, path)
+        except BaseException:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+    # --- Métodos públicos ---
+
+    def get(self, key, terrain_loader=None, lat: float = None, lon: float = None, radius_km: float = None):
+        """
+        Devuelve la vista cacheada (marcándola como reciente) o None.
+
+        Si no está en memoria y hay caché en disco, se busca allí; para eso
+        hacen falta ``terrain_loader`` y la posición y radio de la vista, con
+        los que se comprueba que los .hgt de origen no hayan cambiado.
+        """
+        with self._lock:
+            stage = self._views.get(key)
+            if stage is not None:
+                self._views.move_to_end(key)
+                self.hits += 1
+                return stage
+        if self.cache_dir and terrain_loader is not None:
+            stage = self._read_disk(key, self._source_signature(terrain_loader, lat, lon, radius_km))
+            if stage is not None:
+                self._put_memory(key, stage)
+                with self._lock:
+                    self.disk_hits += 1
+                return stage
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, stage: dict, terrain_loader=None, lat: float = None, lon: float = None,
+            radius_km: float = None):
+        """Guarda una vista en memoria y, si hay caché en disco y ``terrain_loader``, también en disco."""
+        self._put_memory(key, stage)
+        if self.cache_dir and terrain_loader is not None:
+            try:
+                self._write_disk(key, self._source_signature(terrain_loader, lat, lon, radius_km), stage)
+            except Exception as e:
+                print(f"No se pudo guardar la vista en {self.cache_dir}: {e}")
+
+    def clear(self):
+        """Vacía la caché en memoria conservando los contadores."""
+        with self._lock:
+            self._views.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """Resumen de uso de la caché."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'views': len(self._views),
+                'size_mb': self.current_bytes / (1024 * 1024),
+                'budget_mb': self.max_bytes / (1024 * 1024),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -4,24 +4,47 @@ Módulo para la visualización avanzada del terreno utilizando PyVista.
 
 import numpy as np
 import math
+import threading
 import pyvista as pv
 from core.terrain_data import TerrainDataLoader
+from core.geo_projection import LocalENUProjection
+from core.terrain_mosaic import VOID_VALUE
+from core.terrain_pyramid import block_reduce, decimation_error
+from core.view_cache import ViewCache
 from config import (
     DEFAULT_VIEW_RADIUS_KM, DEFAULT_FIELD_OF_VIEW, OBSERVER_HEIGHT_M,
-    MAX_RENDER_POINTS, TERRAIN_CMAP, BACKGROUND_COLOR
+    MAX_RENDER_POINTS, TERRAIN_CMAP, BACKGROUND_COLOR, USE_LOD_RENDERING, LOD_NEAR_RADIUS_KM,
+    DECIMATION_MODE, VIEW_CULLING, VIEW_CULL_MARGIN_DEG, VIEW_CULL_APEX_SLACK, PROGRESSIVE_PREVIEW_POINTS,
+    APPLY_EARTH_CURVATURE, REFRACTION_COEFFICIENT
 )
 
+CAMERA_BACKOFF = 0.4        # Distancia de la cámara detrás del observador, en fracciones del radio
+DEFAULT_WINDOW_SIZE = (1400, 900)
+
 class Horizon3DViewer:
     """
     Clase para generar y mostrar vistas realistas y mejoradas del horizonte.
     """
-    def __init__(self, terrain_data_loader: TerrainDataLoader):
+    def __init__(self, terrain_data_loader: TerrainDataLoader, use_lod: bool = USE_LOD_RENDERING,
+                 decimation_mode: str = DECIMATION_MODE, view_culling: bool = VIEW_CULLING,
+                 view_cache: ViewCache = None):
         self.terrain_loader = terrain_data_loader
+        self.view_cache = ViewCache() if view_cache is None else view_cache
+        self.use_lod = use_lod
+        self.decimation_mode = decimation_mode
+        self.last_decimation = None
+        self.view_culling = view_culling
+        self.surface_view = None
+        self.last_cull_stats = None
+        self.projection = None
+        self._build_lock = threading.Lock()
         self.plotter = None
+        self.terrain_surface = None
         self.current_camera_position = [0, 0, 0]
         self.current_focal_point = [0, 0, 0]
         self.current_azimut = DEFAULT_FIELD_OF_VIEW
         self.current_field_of_view = DEFAULT_FIELD_OF_VIEW
+        self.presented_view = None
         self.observer_terrain_height = 0
         self.observer_total_height = 0
         self.inverted_view = False
@@ -46,108 +69,387 @@ class Horizon3DViewer:
             self.inverted_view = not self.inverted_view
             self.plotter.render()
 
+    def _plotter_is_alive(self) -> bool:
+        """Indica si hay un plotter abierto que se pueda reutilizar."""
+        return (self.plotter is not None and self.terrain_surface is not None
+                and not getattr(self.plotter, '_closed', True))
+
+    def _update_session_surface(self, surface):
+        """
+        Actualiza en sitio la malla que ya está en el plotter.
+
+        Si la topología coincide (misma rejilla estructurada) solo se
+        reemplazan puntos y escalares; si no, se copia la nueva malla sobre el
+        mismo objeto, de modo que los actores existentes no se reconstruyen.
+        Si el tipo de malla cambia se vuelven a añadir los actores.
+        """
+        current = self.terrain_surface
+        if type(current) is not type(surface):
+            # Copia: la malla construida puede estar compartida con la caché de vistas
+            self.terrain_surface = surface.copy()
+            self.add_terrain_to_plotter(self.plotter, self.terrain_surface)
+            return
+        if isinstance(surface, pv.StructuredGrid) and current.dimensions == surface.dimensions:
+            current.points = surface.points
+            current.point_data["elevacion_normalizada"] = surface.point_data["elevacion_normalizada"]
+        else:
+            current.copy_from(surface)
+        current.Modified()
+
     def _get_cardinal_direction(self, angle: float) -> str:
         """Convierte un ángulo en grados a una dirección cardinal."""
         dirs = ["Norte", "Noreste", "Este", "Sureste", "Sur", "Suroeste", "Oeste", "Noroeste"]
         idx = int(((angle % 360) + 22.5) // 45) % 8
         return dirs[idx]
 
-    def generate_3d_view(self, lat_observer: float, lon_observer: float, 
-                         azimut: int = 90, field_of_view: int = 90, 
-                         view_radius_km: int = 150, location_name: str = "Ubicación Personalizada") -> dict:
+    def _grid_points(self, east_km: np.ndarray, north_km: np.ndarray, drop_km, region: np.ndarray):
         """
-        Genera una vista mejorada del terreno centrada en el observador.
-        
+        Puntos float32 de la rejilla de una región int16, sin usar meshgrid.
+
+        Los puntos se escriben directamente en un único arreglo ``(n, 3)`` en
+        el orden de ``pv.StructuredGrid(X, Y, Z)`` (las filas varían más
+        rápido): x = este, y = norte y z = elevación menos la caída por
+        curvatura (``drop_km``, puede ser None). Los vacíos quedan a 0 m.
+
+        Returns:
+            tuple: (puntos, elevaciones en km por punto, elevación mínima en m,
+            elevación máxima en m), con el mínimo y el máximo calculados sobre
+            la región int16.
+        """
+        rows, cols = region.shape
+        points = np.empty((cols, rows, 3), dtype=np.float32)
+        points[:, :, 0] = np.broadcast_to(east_km, region.shape).T
+        points[:, :, 1] = np.broadcast_to(north_km, region.shape).T
+        elevations = points[:, :, 2]
+        np.multiply(region.T, np.float32(0.001), out=elevations)  # m -> km
+
+        voids = region == VOID_VALUE
+        if voids.any():
+            elevations[voids.T] = 0.0
+            region = np.where(voids, 0, region)
+        elevations = elevations.reshape(-1).copy()
+        if drop_km is not None:
+            points[:, :, 2] -= np.broadcast_to(drop_km, region.shape).T
+        return points.reshape(-1, 3), elevations, int(region.min()), int(region.max())
+
+    def _structured_grid(self, east_km: np.ndarray, north_km: np.ndarray, drop_km, region: np.ndarray):
+        """Crea una rejilla estructurada float32; devuelve (rejilla, elevaciones, elevación mín, elevación máx)."""
+        points, elevations, min_elev, max_elev = self._grid_points(east_km, north_km, drop_km, region)
+        grid = pv.StructuredGrid()
+        grid.points = points
+        grid.dimensions = (region.shape[0], region.shape[1], 1)
+        return grid, elevations, min_elev, max_elev
+
+    def _quad_cells(self, keep: np.ndarray, rows: int) -> np.ndarray:
+        """Conectividad ``(n, 4)`` de las celdas marcadas en ``keep`` de una rejilla de ``rows`` filas."""
+        cell_rows, cell_cols = np.nonzero(keep)
+        first = cell_rows + cell_cols * rows
+        return np.stack((first, first + 1, first + 1 + rows, first + rows), axis=1)
+
+    def _compact_cells(self, n_points: int, keep: np.ndarray, rows: int, first_index: int = 0):
+        """
+        Conserva solo las celdas de ``keep`` y los puntos que usan.
+
+        Devuelve la máscara de puntos usados y la conectividad renumerada a
+        partir de ``first_index`` (para concatenar varias rejillas en una
+        sola malla).
+        """
+        quads = self._quad_cells(keep, rows)
+        used = np.zeros(n_points, dtype=bool)
+        used[quads] = True
+        new_index = np.cumsum(used) - 1 + first_index
+        return used, new_index[quads]
+
+    def _horizontal_half_fov(self, field_of_view: float, window_aspect: float = None) -> float:
+        """
+        Semiángulo horizontal (grados) que ve la cámara con un ``view_angle``
+        vertical dado en una ventana de proporción ``window_aspect`` (ancho/alto,
+        por defecto la de ``DEFAULT_WINDOW_SIZE``).
+        """
+        if window_aspect is None:
+            window_aspect = DEFAULT_WINDOW_SIZE[0] / DEFAULT_WINDOW_SIZE[1]
+        return math.degrees(math.atan(math.tan(math.radians(field_of_view) / 2) * window_aspect))
+
+    def _view_cell_mask(self, x_km: np.ndarray, y_km: np.ndarray, half_cell_km: float,
+                        surface_view: tuple = None) -> np.ndarray:
+        """
+        Celdas que pueden aparecer en la vista descrita por ``surface_view``
+        (por defecto, la de la malla en construcción).
+
+        Se conservan las celdas cuyo centro está dentro del radio de vista y,
+        si hay azimut, dentro de la cuña de visión más ``VIEW_CULL_MARGIN_DEG``.
+        La cuña parte de ``VIEW_CULL_APEX_SLACK`` radios por detrás de la
+        cámara (colocada como en ``configure_camera``), de modo que también
+        cubre el terreno junto a la cámara tras girarla un poco. Cada celda se trata como un disco de radio ``half_cell_km``.
+
         Args:
-            lat_observer: Latitud del observador en grados decimales
-            lon_observer: Longitud del observador en grados decimales
-            azimut: Dirección de la vista en grados (0=Norte, 90=Este)
-            field_of_view: Ángulo de visión en grados (10-120)
-            view_radius_km: Radio de visualización en kilómetros
-            location_name: Nombre descriptivo de la ubicación
-            
+            x_km: Coordenada este de los centros de celda.
+            y_km: Coordenada norte de los centros de celda (difundible con ``x_km``).
+        """
+        view_radius_km, azimut, field_of_view, window_aspect = surface_view or self.surface_view
+        distance = np.hypot(x_km, y_km)
+        keep = distance - half_cell_km <= view_radius_km
+        if azimut is None:
+            return keep
+
+        half_angle = self._horizontal_half_fov(field_of_view, window_aspect) + VIEW_CULL_MARGIN_DEG
+        if half_angle >= 180:
+            return keep
+        azimut_rad = math.radians(azimut)
+        dir_x, dir_y = math.sin(azimut_rad), math.cos(azimut_rad)
+        apex_distance_km = (CAMERA_BACKOFF + VIEW_CULL_APEX_SLACK) * view_radius_km
+        rel_x = x_km + apex_distance_km * dir_x
+        rel_y = y_km + apex_distance_km * dir_y
+        rel_dist = np.maximum(np.hypot(rel_x, rel_y), 1e-9)
+        cos_angle = np.clip((rel_x * dir_x + rel_y * dir_y) / rel_dist, -1.0, 1.0)
+        angle = np.degrees(np.arccos(cos_angle) - np.arcsin(np.minimum(1.0, half_cell_km / rel_dist)))
+        return keep & (angle <= half_angle)
+
+    def _cell_centers(self, east_km: np.ndarray, north_km: np.ndarray):
+        """Centros aproximados de las celdas de una rejilla proyectada (promedio de esquinas opuestas)."""
+        east = np.broadcast_to(east_km, (north_km.shape[0], east_km.shape[1]))
+        center_east = (east[:-1, :-1] + east[1:, 1:]) / 2
+        center_north = (north_km[:-1] + north_km[1:]) / 2
+        return center_east, center_north
+
+    def _build_uniform_surface(self, obs_row: int, obs_col: int, view_radius_km: float,
+                               max_points: int = MAX_RENDER_POINTS):
+        """
+        Construye la superficie del terreno con un único paso de reducción uniforme.
+
+        El paso se elige para no pasar de ``max_points`` vértices por lado.
+        Cuando el paso es mayor que 1 cada bloque de ``paso x paso`` celdas se
+        reduce con ``decimation_mode`` (por defecto el máximo, para no perder
+        cumbres en la silueta) y su vértice se coloca en el centro del bloque.
+        El compromiso vértices/error queda en ``last_decimation``.
+
         Returns:
-            dict: Diccionario con información de la vista generada
+            tuple: (superficie, elevaciones en km por punto, elevación mínima
+            en m, elevación máxima en m)
         """
-        print(f"Generando vista para: ({lat_observer:.6f}°, {lon_observer:.6f}°)")
-        print(f"Azimut: {azimut}° | FOV: {field_of_view}° | Radio: {view_radius_km}km")
+        projection = self.projection
+        matrix_rows, matrix_cols = self.terrain_loader.full_terrain_matrix.shape
+        radius_rows = math.ceil(view_radius_km / projection.cell_ns_km)
+        radius_cols = math.ceil(view_radius_km / projection.cell_ew_km)
+        row_min = max(0, obs_row - radius_rows)
+        row_max = min(matrix_rows, obs_row + radius_rows)
+        col_min = max(0, obs_col - radius_cols)
+        col_max = min(matrix_cols, obs_col + radius_cols)
 
-        if self.terrain_loader.full_terrain_matrix is None:
-            raise RuntimeError("La matriz de terreno no ha sido cargada antes de generar la vista.")
+        # Reducir densidad de puntos: como mucho max_points vértices por lado
+        step = max(1, math.ceil(2 * max(radius_rows, radius_cols) / max_points))
+        full_region = np.asarray(self.terrain_loader.full_terrain_matrix[row_min:row_max, col_min:col_max])
 
-        # Convertir coordenadas a índices de matriz
-        obs_row, obs_col = self.terrain_loader.coords_to_indices(lat_observer, lon_observer)
-        self.observer_terrain_height = self.terrain_loader.full_terrain_matrix[obs_row, obs_col]
+        if full_region.size == 0:
+            raise ValueError("La región del terreno está vacía. Ajuste las coordenadas o el radio.")
+
+        if step == 1:
+            terrain_region = full_region
+            self.last_decimation = {'step': 1, 'mode': None, 'vertices': int(full_region.size),
+                                    'peak_error_max_m': 0.0, 'peak_error_mean_m': 0.0, 'surface_error_mean_m': 0.0}
+        else:
+            terrain_region = block_reduce(full_region, step, self.decimation_mode)
+            self.last_decimation = {'step': step, 'mode': self.decimation_mode,
+                                    **decimation_error(full_region, step, terrain_region)}
+            print(f"Reducción {self.decimation_mode} con paso {step}: {self.last_decimation['vertices']} vértices, "
+                  f"pérdida de cumbre máx {self.last_decimation['peak_error_max_m']:.0f} m, "
+                  f"error medio de superficie {self.last_decimation['surface_error_mean_m']:.0f} m")
+
+        # Vértices en el centro de cada bloque reducido, proyectados a ENU
+        rows, cols = terrain_region.shape
+        center_offset = (step - 1) / 2
+        row_centers = np.minimum(row_min + np.arange(rows) * step + center_offset, row_max - 1)
+        col_centers = np.minimum(col_min + np.arange(cols) * step + center_offset, col_max - 1)
+        east_km, north_km, drop_km = projection.project(row_centers, col_centers)
+        if self.surface_view is None:
+            return self._structured_grid(east_km, north_km, drop_km, terrain_region)
+
+        # Recorte al disco de vista (y a la cuña de visión si hay azimut)
+        points, elevations, min_elev, max_elev = self._grid_points(east_km, north_km, drop_km, terrain_region)
+        half_cell_km = step * math.hypot(projection.cell_ns_km, projection.cell_ew_km) / 2
+        keep = self._view_cell_mask(*self._cell_centers(east_km, north_km), half_cell_km)
+        self.last_cull_stats = {'cells_total': int(keep.size), 'cells_kept': int(np.count_nonzero(keep))}
+        if not keep.any():
+            raise ValueError("La región del terreno está vacía. Ajuste las coordenadas o el radio.")
+        used, quads = self._compact_cells(len(points), keep, rows)
+        return pv.UnstructuredGrid({pv.CellType.QUAD: quads}, points[used]), elevations[used], min_elev, max_elev
+
+    def _build_lod_surface(self, obs_row: int, obs_col: int, view_radius_km: float, on_progress=None):
+        """
+        Construye la superficie por anillos de nivel de detalle.
+
+        El anillo ``k`` usa el nivel ``k`` de la pirámide (paso ``2**k``) y
+        llega hasta ``LOD_NEAR_RADIUS_KM * 2**k``; las celdas cubiertas por
+        completo por un anillo más fino se descartan. Así el número de puntos
+        por anillo es aproximadamente constante en lugar de crecer con el
+        cuadrado del radio. Si se da ``on_progress``, se llama con la fracción
+        (0-1) de anillos terminados después de cada anillo.
+
+        Returns:
+            tuple: (superficie, elevaciones en km por punto, elevación mínima
+            en m, elevación máxima en m)
+        """
+        loader = self.terrain_loader
+        projection = self.projection
+        n_rows, n_cols = loader.full_terrain_matrix.shape
+        cell_half_diag_km = math.hypot(projection.cell_ns_km, projection.cell_ew_km) / 2
+
+        n_rings = 1
+        while LOD_NEAR_RADIUS_KM * 2 ** (n_rings - 1) < view_radius_km:
+            n_rings += 1
+
+        ring_points, ring_elevations, ring_quads = [], [], []
+        n_points = 0
+        cells_total = cells_kept = 0
+        min_elev, max_elev = None, None
+        inner_radius_km = 0.0
+        level = 0
+        while inner_radius_km < view_radius_km:
+            outer_radius_km = min(LOD_NEAR_RADIUS_KM * 2 ** level, view_radius_km)
+            factor = 2 ** level
+            level_matrix = loader.get_pyramid_level(level)
+            level_rows, level_cols = level_matrix.shape
+
+            # Ventana del nivel que cubre el anillo (índices del nivel)
+            radius_rows = math.ceil(outer_radius_km / projection.cell_ns_km)
+            radius_cols = math.ceil(outer_radius_km / projection.cell_ew_km)
+            row_min = max(0, (obs_row - radius_rows) // factor)
+            row_max = min(level_rows, -(-(obs_row + radius_rows) // factor) + 1)
+            col_min = max(0, (obs_col - radius_cols) // factor)
+            col_max = min(level_cols, -(-(obs_col + radius_cols) // factor) + 1)
+            region = level_matrix[row_min:row_max, col_min:col_max]
+            if region.shape[0] >= 2 and region.shape[1] >= 2:
+                # Centro de cada celda del nivel en índices de la matriz completa
+                center_offset = (factor - 1) / 2
+                row_full = np.minimum(np.arange(row_min, row_max) * factor + center_offset, n_rows - 1)
+                col_full = np.minimum(np.arange(col_min, col_max) * factor + center_offset, n_cols - 1)
+                east_km, north_km, drop_km = projection.project(row_full, col_full)
+                points, elevations, ring_min, ring_max = self._grid_points(
+                    east_km, north_km, drop_km, np.asarray(region))
+
+                # Descartar celdas totalmente dentro del anillo anterior (más fino)
+                center_east, center_north = self._cell_centers(east_km, north_km)
+                center_dist = np.hypot(center_east, center_north)
+                half_cell_km = factor * cell_half_diag_km
+                keep = center_dist + half_cell_km >= inner_radius_km
+                cells_total += int(np.count_nonzero(keep))
+                if self.surface_view is not None:
+                    keep &= self._view_cell_mask(center_east, center_north, half_cell_km)
+                cells_kept += int(np.count_nonzero(keep))
+                if keep.any():
+                    min_elev = ring_min if min_elev is None else min(min_elev, ring_min)
+                    max_elev = ring_max if max_elev is None else max(max_elev, ring_max)
+                    # Conservar solo los puntos usados y renumerarlos a continuación de los anillos previos
+                    used, quads = self._compact_cells(len(points), keep, len(row_full), n_points)
+                    ring_points.append(points[used])
+                    ring_elevations.append(elevations[used])
+                    ring_quads.append(quads)
+                    n_points += ring_points[-1].shape[0]
+
+            inner_radius_km = outer_radius_km
+            level += 1
+            if on_progress is not None:
+                on_progress(level / n_rings)
+
+        if not ring_points:
+            raise ValueError("La región del terreno está vacía. Ajuste las coordenadas o el radio.")
+        surface = pv.UnstructuredGrid({pv.CellType.QUAD: np.concatenate(ring_quads)}, np.concatenate(ring_points))
+        self.last_cull_stats = {'cells_total': cells_total, 'cells_kept': cells_kept}
+        print(f"Vista LOD: {len(ring_points)} anillos, {surface.n_points} puntos")
+        return surface, np.concatenate(ring_elevations), min_elev, max_elev
+
+    def _update_observer_height(self, lat_observer: float, lon_observer: float):
+        """Altura del terreno (bilineal) y de los ojos del observador en su posición exacta."""
+        self.observer_terrain_height = float(
+            self.terrain_loader.sample_elevations(lat_observer, lon_observer, method='bilinear')
+        )
         
         # Manejar datos faltantes de elevación
-        if self.observer_terrain_height == -32768:
+        if math.isnan(self.observer_terrain_height):
             self.observer_terrain_height = 0
             print("Advertencia: No hay datos de elevación en la posición del observador. Usando 0m.")
         
         self.observer_total_height = self.observer_terrain_height + OBSERVER_HEIGHT_M
 
-        # Calcular región de interés alrededor del observador
-        approx_meters_per_degree = 111000
-        meters_per_index = approx_meters_per_degree / (self.terrain_loader.hgt_resolution - 1)
-        radius_indices = int((view_radius_km * 1000) / meters_per_index)
+    def build_terrain_surface(self, lat_observer: float, lon_observer: float,
+                              view_radius_km: int = 150, azimut: int = None, field_of_view: int = None,
+                              max_points: int = None, on_progress=None, window_aspect: float = None):
+        """
+        Construye la superficie del terreno alrededor del observador.
 
-        row_min = max(0, obs_row - radius_indices)
-        row_max = min(self.terrain_loader.full_terrain_matrix.shape[0], obs_row + radius_indices)
-        col_min = max(0, obs_col - radius_indices)
-        col_max = min(self.terrain_loader.full_terrain_matrix.shape[1], obs_col + radius_indices)
+        La malla está en coordenadas locales ENU del observador, en km: x al
+        este, y al norte y z la elevación corregida por la curvatura
+        terrestre. Actualiza las alturas del observador y devuelve la malla
+        con el escalar ``elevacion_normalizada`` (calculado sobre la elevación
+        real) junto con sus elevaciones mínima y máxima.
+        Con ``view_culling`` activo solo se incluyen las celdas dentro del
+        radio de vista y, si se da ``azimut``, dentro de la cuña de visión
+        (``field_of_view``, por defecto ``DEFAULT_FIELD_OF_VIEW``), cuyo ancho
+        depende de la proporción ``window_aspect`` de la ventana donde se verá
+        (ver ``window_aspect()``). La vista usada queda en ``surface_view``.
+        Con ``max_points`` se construye siempre una malla uniforme de como
+        mucho ``max_points`` vértices por lado (vistas previas).
+        ``on_progress`` recibe el avance (0-1) de las mallas por anillos.
 
-        # Reducir densidad de puntos para mejor rendimiento
-        step = max(1, int(radius_indices / MAX_RENDER_POINTS))
-        terrain_region = self.terrain_loader.full_terrain_matrix[row_min:row_max:step, col_min:col_max:step]
+        Returns:
+            tuple: (superficie, elevación mínima en m, elevación máxima en m)
+        """
+        if self.terrain_loader.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada antes de generar la vista.")
 
-        if terrain_region.size == 0:
-            raise ValueError("La región del terreno está vacía. Ajuste las coordenadas o el radio.")
+        # Convertir coordenadas a índices de matriz
+        obs_row, obs_col = self.terrain_loader.coords_to_indices(lat_observer, lon_observer)
+        self._update_observer_height(lat_observer, lon_observer)
 
-        # Procesamiento de datos de elevación
-        terrain_region = terrain_region.astype(float)
-        terrain_region[terrain_region == -32768] = 0.0
+        # La proyección (y sus ventanas ya calculadas) se reutiliza mientras no cambie el observador
+        if (self.projection is None or self.projection.terrain_loader is not self.terrain_loader or
+                (self.projection.lat_observer, self.projection.lon_observer) != (lat_observer, lon_observer)):
+            self.projection = LocalENUProjection(self.terrain_loader, lat_observer, lon_observer)
 
-        # Crear malla de coordenadas
-        rows, cols = terrain_region.shape
-        x_coords = np.arange(cols) * meters_per_index * step / 1000  # Convertir a km
-        y_coords = np.arange(rows) * meters_per_index * step / 1000
-
-        # Centrar coordenadas en el observador
-        obs_x_relative = (obs_col - col_min) * meters_per_index * step / 1000
-        obs_y_relative = (obs_row - row_min) * meters_per_index * step / 1000
-        x_coords -= obs_x_relative
-        y_coords -= obs_y_relative
-
-        # Crear superficie
-        Z_elevations_km = terrain_region / 1000.0  # Convertir a km
-        X, Y = np.meshgrid(x_coords, y_coords)
-        surface = pv.StructuredGrid(X, Y, Z_elevations_km)
-
-        # Normalización de elevaciones para coloreado
-        elevations_m = surface.points[:, 2] * 1000
-        min_elev_data = np.min(elevations_m)
-        max_elev_data = np.max(elevations_m)
-        elev_range = max(max_elev_data - min_elev_data, 1)
-        normalized_elevations = (elevations_m - min_elev_data) / elev_range
-        surface["elevacion_normalizada"] = normalized_elevations
+        self.last_cull_stats = None
+        if self.view_culling:
+            self.surface_view = (view_radius_km, azimut,
+                                 DEFAULT_FIELD_OF_VIEW if field_of_view is None else field_of_view, window_aspect)
+        else:
+            self.surface_view = None
+
+        if max_points is not None:
+            surface, elevations_km, min_elev_data, max_elev_data = self._build_uniform_surface(
+                obs_row, obs_col, view_radius_km, max_points)
+        elif self.use_lod:
+            surface, elevations_km, min_elev_data, max_elev_data = self._build_lod_surface(
+                obs_row, obs_col, view_radius_km, on_progress)
+        else:
+            surface, elevations_km, min_elev_data, max_elev_data = self._build_uniform_surface(
+                obs_row, obs_col, view_radius_km)
 
-        # Configurar plotter
-        if self.plotter is not None:
-            self.plotter.close()
-            self.plotter = None
+        # Normalización de elevaciones para coloreado (float32, rango tomado de los datos int16)
+        elev_range_km = np.float32(max(max_elev_data - min_elev_data, 1) / 1000.0)
+        normalized_elevations = elevations_km - np.float32(min_elev_data / 1000.0)
+        normalized_elevations /= elev_range_km
+        surface["elevacion_normalizada"] = normalized_elevations
+        if self.last_cull_stats:
+            kept, total = self.last_cull_stats['cells_kept'], self.last_cull_stats['cells_total']
+            print(f"Recorte de vista: {kept} de {total} celdas ({100 * kept / max(total, 1):.0f}%)")
+        return surface, min_elev_data, max_elev_data
 
-        self.plotter = pv.Plotter(window_size=[1400, 900])
-        self.plotter.set_background(BACKGROUND_COLOR)
+    def create_plotter(self, off_screen: bool = None, window_size=DEFAULT_WINDOW_SIZE) -> pv.Plotter:
+        """Crea un plotter con los efectos visuales de la aplicación."""
+        plotter = pv.Plotter(window_size=list(window_size), off_screen=off_screen)
+        plotter.set_background(BACKGROUND_COLOR)
         
         # Habilitar efectos visuales avanzados
-        self.plotter.enable_eye_dome_lighting()
-        self.plotter.enable_depth_peeling()
-        self.plotter.renderer.SetUseDepthPeeling(True)
-        self.plotter.renderer.SetMaximumNumberOfPeels(8)
-        self.plotter.renderer.SetOcclusionRatio(0.05)
+        plotter.enable_eye_dome_lighting()
+        plotter.enable_depth_peeling()
+        plotter.renderer.SetUseDepthPeeling(True)
+        plotter.renderer.SetMaximumNumberOfPeels(8)
+        plotter.renderer.SetOcclusionRatio(0.05)
+        return plotter
 
+    def add_terrain_to_plotter(self, plotter: pv.Plotter, surface):
+        """Añade la superficie del terreno (sombreada y con wireframe sutil) al plotter."""
         # Añadir terreno con sombreado realista
-        self.plotter.add_mesh(
+        plotter.add_mesh(
             surface,
             scalars="elevacion_normalizada",
             cmap=TERRAIN_CMAP,
@@ -161,26 +463,29 @@ class Horizon3DViewer:
             clim=[0.0, 1.0],
             show_scalar_bar=False,
             lighting=True,
-            opacity=1.0
+            opacity=1.0,
+            name="terreno"
         )
 
         # Añadir wireframe sutil
-        self.plotter.add_mesh(
+        plotter.add_mesh(
             surface,
             color="#444444",
             style="wireframe",
             opacity=0.1,
-            line_width=0.8
+            line_width=0.8,
+            name="terreno_wireframe"
         )
 
-        # Configuración avanzada de la cámara (CORREGIDA)
+    def configure_camera(self, plotter: pv.Plotter, azimut: int, field_of_view: int, view_radius_km: int):
+        """Coloca la cámara detrás y por encima del observador mirando hacia el azimut."""
         self.current_azimut = azimut
         self.current_field_of_view = field_of_view
         camera_height_km = self.observer_total_height / 1000.0
         azimut_rad = math.radians(azimut)
         
         # Posición de la cámara (detrás y arriba del observador)
-        camera_distance_km = view_radius_km * 0.4
+        camera_distance_km = view_radius_km * CAMERA_BACKOFF
         cam_x = -camera_distance_km * math.sin(azimut_rad)  # Negativo para posición detrás
         cam_y = -camera_distance_km * math.cos(azimut_rad)
         cam_z = camera_height_km + 0.1  # Levantamos un poco la cámara
@@ -195,27 +500,233 @@ class Horizon3DViewer:
         self.current_camera_position = [cam_x, cam_y, cam_z]
         self.current_focal_point = [focal_x, focal_y, focal_z]
         
-        self.plotter.camera.position = self.current_camera_position
-        self.plotter.camera.focal_point = self.current_focal_point
-        self.plotter.camera.up = [0, 0, 1]  # Eje Z como arriba
-        self.plotter.camera.view_angle = field_of_view
+        plotter.camera.position = self.current_camera_position
+        plotter.camera.focal_point = self.current_focal_point
+        plotter.camera.up = [0, 0, 1]  # Eje Z como arriba
+        plotter.camera.view_angle = field_of_view
 
         # Configurar rangos de clipping
         near_clip = 0.001
         far_clip = view_radius_km * 2.5
-        self.plotter.camera.clipping_range = (near_clip, far_clip)
+        plotter.camera.clipping_range = (near_clip, far_clip)
 
-        # Configurar interacción
-        self.plotter.track_mouse_position = True
-        self.plotter.enable_trackball_style()  # Rotación libre con mouse
-        
-        # Teclas especiales
-        self.plotter.add_key_event('space', self._invert_view)
-        self.plotter.add_key_event('q', self.plotter.close)
+    def build_view_stage(self, lat_observer: float, lon_observer: float, azimut: int = 90,
+                         field_of_view: int = 90, view_radius_km: int = 150, max_points: int = None,
+                         on_progress=None, window_aspect: float = None) -> dict:
+        """
+        Construye la malla de una vista sin tocar el plotter.
+
+        Puede llamarse desde hilos de trabajo (las construcciones se
+        serializan): el resultado (malla y sus estadísticas) se presenta
+        después en el hilo de la interfaz con ``present_view``.
+        ``on_progress(fracción)`` informa del avance dentro de la construcción.
+        ``window_aspect`` es la proporción de la ventana donde se presentará,
+        tomada antes en el hilo de la interfaz con ``window_aspect()``.
+
+        Returns:
+            dict: Malla (``surface``), parámetros de la vista y estadísticas de
+            la construcción.
+        """
+        with self._build_lock:
+            return self._build_view_stage(lat_observer, lon_observer, azimut, field_of_view,
+                                          view_radius_km, max_points, on_progress, window_aspect)
+
+    def _view_cache_key(self, lat_observer, lon_observer, azimut, field_of_view, view_radius_km, max_points,
+                        window_aspect=None):
+        """
+        Clave de caché: celda del observador, radio, cuña de visión y parámetros de reducción.
+
+        La cuña incluye el semiángulo horizontal, que depende de la proporción
+        de la ventana además del campo de visión vertical.
+        """
+        obs_row, obs_col = self.terrain_loader.coords_to_indices(lat_observer, lon_observer)
+        wedge = None
+        if self.view_culling:
+            field_of_view = DEFAULT_FIELD_OF_VIEW if field_of_view is None else field_of_view
+            wedge = (azimut, field_of_view, round(self._horizontal_half_fov(field_of_view, window_aspect), 6))
+        return (int(obs_row), int(obs_col), view_radius_km, wedge, max_points,
+                self.use_lod, self.decimation_mode, bool(self.terrain_loader.fill_voids),
+                APPLY_EARTH_CURVATURE, REFRACTION_COEFFICIENT)
+
+    def _usable_view_cache_key(self, lat_observer, lon_observer, azimut, field_of_view, view_radius_km,
+                               max_points, window_aspect=None):
+        """Clave de caché de la vista, o None si la vista no debe cachearse."""
+        # Mientras el mosaico se carga por teselas la vista aún puede cambiar: no se cachea
+        if self.view_cache is None or getattr(self.terrain_loader, 'loading_incremental', False):
+            return None
+        return self._view_cache_key(lat_observer, lon_observer, azimut, field_of_view, view_radius_km, max_points,
+                                    window_aspect)
+
+    def _cached_view_stage(self, key, lat_observer, lon_observer, azimut, field_of_view, view_radius_km):
+        """Vista guardada en la caché con ``key``, adaptada a la posición exacta del observador, o None."""
+        cached = self.view_cache.get(key, self.terrain_loader, lat_observer, lon_observer, view_radius_km)
+        if cached is None:
+            return None
+        # La malla se comparte; solo se recalcula la altura del observador en su posición exacta
+        self._update_observer_height(lat_observer, lon_observer)
+        self.surface_view = cached['surface_view']
+        self.last_cull_stats = cached['culling']
+        print(f"Vista reutilizada de la caché ({cached['surface'].n_points:,} puntos)")
+        stage = dict(cached)
+        stage.update(
+            coordinates=(lat_observer, lon_observer),
+            azimut=azimut,
+            field_of_view=field_of_view,
+            view_radius_km=view_radius_km,
+            observer_height_m=self.observer_total_height,
+            terrain_height_m=self.observer_terrain_height,
+        )
+        return stage
+
+    def _build_view_stage(self, lat_observer, lon_observer, azimut, field_of_view, view_radius_km, max_points,
+                          on_progress=None, window_aspect=None, lookup_cache: bool = True):
+        key = self._usable_view_cache_key(lat_observer, lon_observer, azimut, field_of_view,
+                                          view_radius_km, max_points, window_aspect)
+        if key is not None and lookup_cache:
+            stage = self._cached_view_stage(key, lat_observer, lon_observer, azimut, field_of_view,
+                                            view_radius_km)
+            if stage is not None:
+                return stage
+
+        stage = self._build_view_stage_uncached(lat_observer, lon_observer, azimut, field_of_view,
+                                                view_radius_km, max_points, on_progress, window_aspect)
+        if key is not None:
+            self.view_cache.put(key, dict(stage), self.terrain_loader, lat_observer, lon_observer, view_radius_km)
+        return stage
+
+    def _build_view_stage_uncached(self, lat_observer, lon_observer, azimut, field_of_view, view_radius_km,
+                                   max_points, on_progress=None, window_aspect=None):
+        surface, min_elev_data, max_elev_data = self.build_terrain_surface(
+            lat_observer, lon_observer, view_radius_km, azimut, field_of_view, max_points, on_progress,
+            window_aspect
+        )
+        preview = max_points is not None
+        return {
+            'surface': surface,
+            'coordinates': (lat_observer, lon_observer),
+            'azimut': azimut,
+            'field_of_view': field_of_view,
+            'view_radius_km': view_radius_km,
+            'surface_view': self.surface_view,
+            'min_elevation_m': min_elev_data,
+            'max_elevation_m': max_elev_data,
+            'observer_height_m': self.observer_total_height,
+            'terrain_height_m': self.observer_terrain_height,
+            'decimation': self.last_decimation if preview or not self.use_lod else None,
+            'culling': self.last_cull_stats,
+            'preview': preview,
+        }
+
+    @staticmethod
+    def _stage_progress(on_progress, start: float, cost: float, total_cost: float):
+        """Convierte el avance (0-1) de una etapa en avance global para ``on_progress``, o None sin él."""
+        if on_progress is None:
+            return None
+        return lambda fraction: on_progress((start + cost * fraction) / total_cost)
+
+    def iter_view_stages(self, lat_observer: float, lon_observer: float, azimut: int = 90,
+                         field_of_view: int = 90, view_radius_km: int = 150,
+                         preview_points=PROGRESSIVE_PREVIEW_POINTS, should_cancel=None, on_progress=None,
+                         window_aspect: float = None):
+        """
+        Construye la vista de gruesa a fina.
+
+        Produce primero una vista previa uniforme por cada presupuesto de
+        ``preview_points`` (vértices por lado, de menor a mayor) y al final la
+        vista completa. Cada etapa lleva ``level``, ``levels`` y ``progress``
+        (fracción 0-1 del trabajo estimado, proporcional a los vértices de
+        cada etapa). Si ``should_cancel()`` devuelve True antes de una etapa,
+        la generación se detiene sin construirla. ``on_progress(fracción)``
+        recibe además el avance global durante cada etapa (por ejemplo, anillo
+        a anillo en la vista completa), que puede tardar varios segundos.
+
+        Si la vista completa ya está en la caché se produce directamente, sin
+        vistas previas. ``window_aspect`` se pasa a ``build_view_stage``.
+        """
+        budgets = [points for points in preview_points if points < MAX_RENDER_POINTS]
+        costs = [points ** 2 for points in budgets] + [MAX_RENDER_POINTS ** 2]
+        total_cost = float(sum(costs))
+        levels = len(costs)
+        if should_cancel is not None and should_cancel():
+            return
+
+        with self._build_lock:
+            key = self._usable_view_cache_key(lat_observer, lon_observer, azimut, field_of_view,
+                                              view_radius_km, None, window_aspect)
+            stage = None
+            if key is not None:
+                stage = self._cached_view_stage(key, lat_observer, lon_observer, azimut, field_of_view,
+                                                view_radius_km)
+        if stage is not None:
+            if on_progress is not None:
+                on_progress(1.0)
+            stage.update(level=levels - 1, levels=levels, progress=1.0)
+            yield stage
+            return
+
+        done_cost = 0
+        for level, max_points in enumerate(budgets + [None]):
+            if should_cancel is not None and should_cancel():
+                return
+            stage_progress = self._stage_progress(on_progress, done_cost, costs[level], total_cost)
+            with self._build_lock:
+                # La vista completa ya se buscó en la caché al empezar
+                stage = self._build_view_stage(lat_observer, lon_observer, azimut, field_of_view,
+                                               view_radius_km, max_points, stage_progress, window_aspect,
+                                               lookup_cache=max_points is not None)
+            done_cost += costs[level]
+            stage.update(level=level, levels=levels, progress=done_cost / total_cost)
+            yield stage
+
+    def present_view(self, stage: dict, location_name: str = "Ubicación Personalizada") -> dict:
+        """
+        Muestra en el plotter una etapa construida con ``build_view_stage``.
+
+        Si el plotter sigue abierto la malla se reemplaza en sitio (así las
+        etapas de una vista progresiva se van sustituyendo); si no, se crea
+        uno nuevo. Debe llamarse desde el hilo de la interfaz.
+
+        Returns:
+            dict: Diccionario con información de la vista presentada
+        """
+        surface = stage['surface']
+        lat_observer, lon_observer = stage['coordinates']
+        azimut, field_of_view = stage['azimut'], stage['field_of_view']
+        view_radius_km = stage['view_radius_km']
+        self.observer_total_height = stage['observer_height_m']
+        self.observer_terrain_height = stage['terrain_height_m']
+        self.presented_view = stage['surface_view']
+
+        # Reutilizar la sesión de renderizado si el plotter sigue abierto
+        reused_session = self._plotter_is_alive()
+        if reused_session:
+            self._update_session_surface(surface)
+        else:
+            if self.plotter is not None:
+                self.plotter.close()
+                self.plotter = None
+
+            self.plotter = self.create_plotter()
+            self.terrain_surface = surface.copy()
+            self.add_terrain_to_plotter(self.plotter, self.terrain_surface)
+
+            # Configurar interacción
+            self.plotter.track_mouse_position = True
+            self.plotter.enable_trackball_style()  # Rotación libre con mouse
+            
+            # Teclas especiales
+            self.plotter.add_key_event('space', self._invert_view)
+            self.plotter.add_key_event('q', self.plotter.close)
+
+        # Configuración avanzada de la cámara (CORREGIDA)
+        self.configure_camera(self.plotter, azimut, field_of_view, view_radius_km)
 
         # Añadir información de ubicación
         text = f"{location_name}\nLat: {lat_observer:.6f}°\nLon: {lon_observer:.6f}°"
-        self.plotter.add_text(text, position='upper_left', font_size=14, color='white', shadow=True)
+        self.plotter.add_text(text, position='upper_left', font_size=14, color='white', shadow=True,
+                              name='ubicacion')
+        if reused_session:
+            self.plotter.render()
 
         # Información de retorno
         info_data = {
@@ -227,44 +738,122 @@ class Horizon3DViewer:
             'cardinal_direction': self._get_cardinal_direction(azimut),
             'coordinates': (lat_observer, lon_observer),
             'view_radius_km': view_radius_km,
-            'max_elevation_m': max_elev_data,
-            'min_elevation_m': min_elev_data,
+            'max_elevation_m': stage['max_elevation_m'],
+            'min_elevation_m': stage['min_elevation_m'],
             'rendered_points': surface.n_points,
-            'location_name': location_name
+            'decimation': stage['decimation'],
+            'culling': stage['culling'],
+            'location_name': location_name,
+            'reused_session': reused_session,
+            'preview': stage['preview']
         }
         
         return info_data
 
-    def show_view(self):
-        """Muestra la ventana de visualización con todas las interacciones."""
+    def generate_3d_view(self, lat_observer: float, lon_observer: float, 
+                         azimut: int = 90, field_of_view: int = 90, 
+                         view_radius_km: int = 150, location_name: str = "Ubicación Personalizada") -> dict:
+        """
+        Genera una vista mejorada del terreno centrada en el observador.
+        
+        Args:
+            lat_observer: Latitud del observador en grados decimales
+            lon_observer: Longitud del observador en grados decimales
+            azimut: Dirección de la vista en grados (0=Norte, 90=Este)
+            field_of_view: Ángulo de visión en grados (10-120)
+            view_radius_km: Radio de visualización en kilómetros
+            location_name: Nombre descriptivo de la ubicación
+            
+        Returns:
+            dict: Diccionario con información de la vista generada
+        """
+        print(f"Generando vista para: ({lat_observer:.6f}°, {lon_observer:.6f}°)")
+        print(f"Azimut: {azimut}° | FOV: {field_of_view}° | Radio: {view_radius_km}km")
+
+        stage = self.build_view_stage(lat_observer, lon_observer, azimut, field_of_view, view_radius_km,
+                                      window_aspect=self.window_aspect())
+        return self.present_view(stage, location_name)
+
+    def show_view(self, interactive_update: bool = False):
+        """
+        Muestra la ventana de visualización con todas las interacciones.
+
+        Con ``interactive_update`` la ventana se abre sin bloquear y quien
+        llama debe procesar sus eventos periódicamente con ``process_events``
+        (por ejemplo, desde un QTimer de la interfaz).
+        """
         if self.plotter:
             # Configuración final antes de mostrar
             self.plotter.enable_anti_aliasing('ssaa')
-            self.plotter.show(auto_close=False)
+            self.plotter.show(auto_close=False, interactive_update=interactive_update)
         else:
             print("Error: No hay vista para mostrar. Genere una vista primero.")
 
+    def process_events(self):
+        """Procesa los eventos pendientes de una ventana abierta con ``show_view(interactive_update=True)``."""
+        if self._plotter_is_alive():
+            self.plotter.update()
+
+    def window_aspect(self) -> float:
+        """
+        Proporción ancho/alto de la ventana de la vista, o la de
+        ``DEFAULT_WINDOW_SIZE`` si no hay ninguna abierta.
+
+        Lee el plotter: debe llamarse desde el hilo de la interfaz.
+        """
+        width, height = self.plotter.window_size if self._plotter_is_alive() else DEFAULT_WINDOW_SIZE
+        return width / max(height, 1)
+
+    def covers_azimut(self, azimut: float) -> bool:
+        """
+        Indica si la malla presentada sirve para mirar hacia ``azimut`` sin reconstruirla.
+
+        Sin recorte por cuña siempre sirve. Con cuña se comprueba que la
+        región visible desde la nueva posición de la cámara quede dentro de
+        la cuña con la que se construyó la malla: basta con comprobar la
+        posición de la cámara y el arco del radio de vista dentro del campo
+        horizontal.
+        """
+        if self.presented_view is None or self.presented_view[1] is None:
+            return True
+        view_radius_km, _, field_of_view, _ = self.presented_view
+        half_fov = math.radians(self._horizontal_half_fov(field_of_view, self.window_aspect()))
+        azimut_rad = math.radians(azimut)
+        apex_x = -CAMERA_BACKOFF * view_radius_km * math.sin(azimut_rad)
+        apex_y = -CAMERA_BACKOFF * view_radius_km * math.cos(azimut_rad)
+
+        # Extremos de los rayos del campo de visión al cortar el círculo del radio de vista
+        ray_angles = azimut_rad + np.linspace(-half_fov, half_fov, 33)
+        dir_x, dir_y = np.sin(ray_angles), np.cos(ray_angles)
+        along = apex_x * dir_x + apex_y * dir_y
+        reach = -along + np.sqrt(np.maximum(along ** 2 - (apex_x ** 2 + apex_y ** 2 - view_radius_km ** 2), 0.0))
+        reach *= 1 - 1e-6  # Dentro del disco pese al redondeo
+        x = np.append(apex_x + reach * dir_x, apex_x)
+        y = np.append(apex_y + reach * dir_y, apex_y)
+        return bool(self._view_cell_mask(x, y, 0.0, self.presented_view).all())
+
     def update_camera_direction(self, new_azimut: int):
         """Actualiza la dirección de la cámara en la vista."""
         if self.plotter:
             self.current_azimut = new_azimut
             azimut_rad = math.radians(new_azimut)
             
-            # Actualizar posición y punto focal manteniendo las distancias
-            cam_dist = np.linalg.norm(self.current_camera_position)
-            focal_dist = np.linalg.norm(self.current_focal_point)
+            # Actualizar posición y punto focal manteniendo las distancias horizontales
+            cam_dist = math.hypot(*self.current_camera_position[:2])
+            focal_dist = math.hypot(*self.current_focal_point[:2])
             
-            self.plotter.camera.position = [
+            self.current_camera_position = [
                 -cam_dist * math.sin(azimut_rad),
                 -cam_dist * math.cos(azimut_rad),
                 self.current_camera_position[2]
             ]
-            
-            self.plotter.camera.focal_point = [
+            self.current_focal_point = [
                 focal_dist * math.sin(azimut_rad),
                 focal_dist * math.cos(azimut_rad),
                 self.current_focal_point[2]
             ]
+            self.plotter.camera.position = self.current_camera_position
+            self.plotter.camera.focal_point = self.current_focal_point
             
             self.plotter.camera.up = [0, 0, 1]
             self.plotter.render()
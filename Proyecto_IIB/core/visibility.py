@@ -0,0 +1,270 @@
+# core/visibility.py
+"""
+Análisis de visibilidad (línea de vista) sobre el mosaico de elevaciones.
+"""
+
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from core.terrain_data import TerrainDataLoader
+from core.terrain_mosaic import VOID_VALUE
+from config import (
+    OBSERVER_HEIGHT_M, DEFAULT_VIEW_RADIUS_KM, EARTH_RADIUS_M, REFRACTION_COEFFICIENT,
+    HORIZON_AZIMUTH_BINS, HORIZON_CACHE_SIZE
+)
+
+
+def curvature_drop(distance_m, refraction: float = REFRACTION_COEFFICIENT):
+    """
+    Caída aparente del terreno por la curvatura terrestre a una distancia dada.
+
+    Usa la aproximación ``d² / (2R)`` corregida por refracción atmosférica
+    (el radio efectivo de la Tierra es ``R / (1 - k)``).
+    """
+    return np.square(distance_m) * (1.0 - refraction) / (2.0 * EARTH_RADIUS_M)
+
+
+class LineOfSightAnalyzer:
+    """
+    Base común de los análisis de línea de vista sobre el mosaico de terreno.
+    """
+
+    def __init__(self, terrain_loader: TerrainDataLoader):
+        self.terrain_loader = terrain_loader
+
+    def _cell_size_m(self, lat: float) -> tuple[float, float]:
+        """Tamaño de celda (norte-sur, este-oeste) en metros a una latitud dada."""
+        meters_per_degree = EARTH_RADIUS_M * math.pi / 180.0
+        span = self.terrain_loader.hgt_resolution - 1
+        return meters_per_degree / span, meters_per_degree * math.cos(math.radians(lat)) / span
+
+    def _observer_setup(self, lat: float, lon: float, observer_height_m: float):
+        """Devuelve los índices del observador y su altura absoluta en metros."""
+        loader = self.terrain_loader
+        if loader.full_terrain_matrix is None:
+            raise RuntimeError("La matriz de terreno no ha sido cargada.")
+        obs_row, obs_col = loader.coords_to_indices(lat, lon)
+        ground = float(loader.sample_elevations(lat, lon, method='bilinear'))
+        if math.isnan(ground):
+            ground = 0.0
+        return obs_row, obs_col, ground + observer_height_m
+
+    def _extract_window(self, obs_row: int, obs_col: int, radius_rows: int, radius_cols: int):
+        """Extrae la ventana alrededor del observador como float32 con NaN en los vacíos."""
+        matrix = self.terrain_loader.full_terrain_matrix
+        row_min = max(0, obs_row - radius_rows)
+        row_max = min(matrix.shape[0], obs_row + radius_rows + 1)
+        col_min = max(0, obs_col - radius_cols)
+        col_max = min(matrix.shape[1], obs_col + radius_cols + 1)
+        window = np.asarray(matrix[row_min:row_max, col_min:col_max]).astype(np.float32)
+        window[window == VOID_VALUE] = np.nan
+        return window, row_min, col_min
+
+
+class ViewshedAnalyzer(LineOfSightAnalyzer):
+    """
+    Calcula qué celdas del terreno son visibles desde un observador.
+
+    El algoritmo es radial: se lanzan rayos desde el observador hacia cada
+    celda del borde de la ventana y, sobre todos los rayos a la vez, se
+    compara la tangente del ángulo de elevación de cada muestra con el
+    máximo acumulado de las muestras anteriores del mismo rayo.
+    """
+
+    def compute(self, lat_observer: float, lon_observer: float,
+                observer_height_m: float = OBSERVER_HEIGHT_M,
+                radius_km: float = DEFAULT_VIEW_RADIUS_KM,
+                refraction: float = REFRACTION_COEFFICIENT) -> dict:
+        """
+        Calcula la cuenca visual (viewshed) alrededor del observador.
+
+        Args:
+            lat_observer: Latitud del observador en grados decimales.
+            lon_observer: Longitud del observador en grados decimales.
+            observer_height_m: Altura del observador sobre el terreno.
+            radius_km: Radio máximo de análisis.
+            refraction: Coeficiente de refracción atmosférica (0 = sin refracción).
+
+        Returns:
+            dict: ``visible`` (máscara booleana de la ventana), ``row_min`` y
+            ``col_min`` (origen de la ventana en la matriz completa),
+            ``observer_index``, ``visible_fraction`` y ``elapsed_s``.
+        """
+        start = time.perf_counter()
+        obs_row, obs_col, observer_z = self._observer_setup(lat_observer, lon_observer, observer_height_m)
+        cell_ns_m, cell_ew_m = self._cell_size_m(lat_observer)
+        radius_m = radius_km * 1000.0
+        radius_rows = int(math.ceil(radius_m / cell_ns_m))
+        radius_cols = int(math.ceil(radius_m / cell_ew_m))
+
+        window, row_min, col_min = self._extract_window(obs_row, obs_col, radius_rows, radius_cols)
+        n_rows, n_cols = window.shape
+        local_row, local_col = obs_row - row_min, obs_col - col_min
+
+        # Destinos de los rayos: todas las celdas del borde del rectángulo de análisis
+        top, bottom = local_row - radius_rows, local_row + radius_rows
+        left, right = local_col - radius_cols, local_col + radius_cols
+        cols_span = np.arange(left, right + 1)
+        rows_span = np.arange(top + 1, bottom)
+        target_rows = np.concatenate((np.full(cols_span.size, top), np.full(cols_span.size, bottom),
+                                      rows_span, rows_span))
+        target_cols = np.concatenate((cols_span, cols_span,
+                                      np.full(rows_span.size, left), np.full(rows_span.size, right)))
+
+        # Muestras a lo largo de cada rayo con paso de a lo sumo una celda por eje
+        n_steps = max(radius_rows, radius_cols)
+        fractions = np.arange(1, n_steps + 1, dtype=np.float32) / n_steps
+        sample_rows = np.rint(local_row + (target_rows - local_row)[:, None] * fractions).astype(np.int64)
+        sample_cols = np.rint(local_col + (target_cols - local_col)[:, None] * fractions).astype(np.int64)
+
+        dy = (sample_rows - local_row) * cell_ns_m
+        dx = (sample_cols - local_col) * cell_ew_m
+        distance = np.hypot(dx, dy)
+        inside = ((sample_rows >= 0) & (sample_rows < n_rows) & (sample_cols >= 0) & (sample_cols < n_cols)
+                  & (distance <= radius_m) & (distance > 0))
+
+        elevation = np.full(sample_rows.shape, np.nan, dtype=np.float32)
+        elevation[inside] = window[sample_rows[inside], sample_cols[inside]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tangent = (elevation - curvature_drop(distance, refraction) - observer_z) / distance
+
+        # Una muestra es visible si su tangente supera a todas las anteriores del rayo
+        running_max = np.fmax.accumulate(tangent, axis=1)
+        previous_max = np.empty_like(running_max)
+        previous_max[:, 0] = -np.inf
+        previous_max[:, 1:] = running_max[:, :-1]
+        previous_max = np.where(np.isnan(previous_max), -np.inf, previous_max)
+        sample_visible = inside & (tangent >= previous_max)
+
+        visible = np.zeros((n_rows, n_cols), dtype=bool)
+        visible[sample_rows[sample_visible], sample_cols[sample_visible]] = True
+        visible[local_row, local_col] = True
+
+        row_offsets = (np.arange(n_rows) - local_row)[:, None] * cell_ns_m
+        col_offsets = (np.arange(n_cols) - local_col)[None, :] * cell_ew_m
+        in_radius = np.hypot(row_offsets, col_offsets) <= radius_m
+        visible &= in_radius
+
+        elapsed = time.perf_counter() - start
+        visible_fraction = float(visible.sum()) / max(int(in_radius.sum()), 1)
+        print(f"Viewshed: {visible_fraction:.1%} visible en {radius_km} km ({elapsed:.2f}s)")
+        return {
+            'visible': visible,
+            'row_min': row_min,
+            'col_min': col_min,
+            'observer_index': (obs_row, obs_col),
+            'observer_elevation_m': observer_z,
+            'visible_fraction': visible_fraction,
+            'elapsed_s': elapsed,
+        }
+
+
+class HorizonProfiler(LineOfSightAnalyzer):
+    """
+    Extrae el perfil del horizonte (skyline) de 360° desde un observador.
+
+    Para cada sector de azimut se marcha un rayo desde el observador hasta
+    el radio de visualización y se guarda el máximo ángulo de elevación
+    aparente (con curvatura y refracción). Todos los rayos se procesan a la
+    vez con NumPy y los perfiles calculados se guardan en una caché LRU, de
+    modo que mover el azimut solo consulta el perfil ya calculado.
+    """
+
+    def __init__(self, terrain_loader: TerrainDataLoader, cache_size: int = HORIZON_CACHE_SIZE):
+        super().__init__(terrain_loader)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def compute(self, lat_observer: float, lon_observer: float,
+                observer_height_m: float = OBSERVER_HEIGHT_M,
+                radius_km: float = DEFAULT_VIEW_RADIUS_KM,
+                n_bins: int = HORIZON_AZIMUTH_BINS,
+                refraction: float = REFRACTION_COEFFICIENT) -> dict:
+        """
+        Calcula el ángulo de elevación máximo por sector de azimut.
+
+        Args:
+            lat_observer: Latitud del observador en grados decimales.
+            lon_observer: Longitud del observador en grados decimales.
+            observer_height_m: Altura del observador sobre el terreno.
+            radius_km: Distancia máxima de los rayos.
+            n_bins: Número de sectores de azimut (3600 = 0.1°).
+            refraction: Coeficiente de refracción atmosférica.
+
+        Returns:
+            dict: ``azimuths_deg`` (centro de cada sector, 0=Norte, 90=Este),
+            ``elevation_deg`` (ángulo del horizonte, NaN sin datos),
+            ``distance_km`` (distancia del punto que forma el horizonte),
+            ``observer_elevation_m`` y ``elapsed_s``.
+        """
+        start = time.perf_counter()
+        obs_row, obs_col, observer_z = self._observer_setup(lat_observer, lon_observer, observer_height_m)
+        key = (obs_row, obs_col, round(observer_z, 2), float(radius_km), int(n_bins), float(refraction))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        cell_ns_m, cell_ew_m = self._cell_size_m(lat_observer)
+        radius_m = radius_km * 1000.0
+        radius_rows = int(math.ceil(radius_m / cell_ns_m))
+        radius_cols = int(math.ceil(radius_m / cell_ew_m))
+        window, row_min, col_min = self._extract_window(obs_row, obs_col, radius_rows, radius_cols)
+        n_rows, n_cols = window.shape
+        local_row, local_col = obs_row - row_min, obs_col - col_min
+
+        # Muestras equiespaciadas (una por celda) a lo largo de cada rayo
+        step_m = min(cell_ns_m, cell_ew_m)
+        distances = np.arange(1, int(radius_m / step_m) + 1, dtype=np.float32) * step_m
+        azimuths = (np.arange(n_bins) + 0.5) * (360.0 / n_bins)
+        azimuth_rad = np.radians(azimuths).astype(np.float32)
+        sample_rows = np.rint(local_row - np.cos(azimuth_rad)[:, None] * distances / cell_ns_m).astype(np.int64)
+        sample_cols = np.rint(local_col + np.sin(azimuth_rad)[:, None] * distances / cell_ew_m).astype(np.int64)
+        inside = (sample_rows >= 0) & (sample_rows < n_rows) & (sample_cols >= 0) & (sample_cols < n_cols)
+
+        elevation = np.full(sample_rows.shape, np.nan, dtype=np.float32)
+        elevation[inside] = window[sample_rows[inside], sample_cols[inside]]
+        tangent = (elevation - curvature_drop(distances, refraction) - observer_z) / distances
+
+        all_void = np.all(np.isnan(tangent), axis=1)
+        best = np.argmax(np.where(np.isnan(tangent), -np.inf, tangent), axis=1)
+        best_tangent = tangent[np.arange(n_bins), best]
+        elevation_deg = np.degrees(np.arctan(best_tangent)).astype(np.float64)
+        distance_km = distances[best].astype(np.float64) / 1000.0
+        elevation_deg[all_void] = np.nan
+        distance_km[all_void] = np.nan
+
+        elapsed = time.perf_counter() - start
+        profile = {
+            'azimuths_deg': azimuths,
+            'elevation_deg': elevation_deg,
+            'distance_km': distance_km,
+            'observer_elevation_m': observer_z,
+            'elapsed_s': elapsed,
+        }
+        self._cache[key] = profile
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        print(f"Perfil del horizonte: {n_bins} sectores en {radius_km} km ({elapsed:.2f}s)")
+        return profile
+
+    @staticmethod
+    def profile_window(profile: dict, azimut: float, field_of_view: float) -> dict:
+        """
+        Recorta un perfil ya calculado al sector ``azimut ± field_of_view/2``.
+
+        Es una operación de indexado, adecuada para llamarse en cada movimiento
+        del control de azimut.
+        """
+        azimuths = profile['azimuths_deg']
+        offset = (azimuths - azimut + 180.0) % 360.0 - 180.0
+        mask = np.abs(offset) <= field_of_view / 2
+        order = np.argsort(offset[mask])
+        return {
+            'relative_azimuth_deg': offset[mask][order],
+            'azimuths_deg': azimuths[mask][order],
+            'elevation_deg': profile['elevation_deg'][mask][order],
+            'distance_km': profile['distance_km'][mask][order],
+        }
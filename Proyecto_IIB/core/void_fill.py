@@ -0,0 +1,127 @@
+# core/void_fill.py
+"""
+Relleno de vacíos (-32768) de los bloques SRTM.
+
+El relleno es una pirámide "pull-push" vectorizada: se reduce el bloque con
+promedios 2x2 que ignoran los vacíos hasta que no queda ninguno y luego se
+vuelve hacia abajo rellenando cada nivel con el anterior. En cada nivel se
+aplican unas iteraciones de Laplace (Jacobi) solo sobre las celdas
+rellenadas, de modo que el resultado es una superficie suave que empalma
+con el terreno medido.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from core.terrain_mosaic import VOID_VALUE
+from core.terrain_pyramid import downsample_2x
+from config import VOID_FILL_CACHE_DIR, VOID_FILL_ITERATIONS
+
+VOID_FILL_FORMAT_VERSION = 1
+
+
+def _relax(filled: np.ndarray, voids: np.ndarray, iterations: int):
+    """Iteraciones de Jacobi de la ecuación de Laplace solo sobre las celdas ``voids``."""
+    rows, cols = np.nonzero(voids)
+    max_row, max_col = filled.shape[0] - 1, filled.shape[1] - 1
+    neighbours = (
+        (np.maximum(rows - 1, 0), cols), (np.minimum(rows + 1, max_row), cols),
+        (rows, np.maximum(cols - 1, 0)), (rows, np.minimum(cols + 1, max_col)),
+    )
+    for _ in range(iterations):
+        filled[rows, cols] = sum(filled[r, c] for r, c in neighbours) * 0.25
+
+
+def fill_voids(tile: np.ndarray, iterations: int = VOID_FILL_ITERATIONS) -> np.ndarray:
+    """
+    Devuelve una copia int16 de ``tile`` con los vacíos interpolados.
+
+    Si el bloque no tiene vacíos se devuelve tal cual; si está completamente
+    vacío no hay nada con qué interpolar y también se devuelve sin cambios.
+    """
+    voids = tile == VOID_VALUE
+    if not voids.any() or voids.all():
+        return tile
+
+    # Pull: reducir hasta que el nivel más grueso no tenga vacíos
+    levels = [tile]
+    while (levels[-1] == VOID_VALUE).any() and min(levels[-1].shape) > 1:
+        levels.append(downsample_2x(levels[-1], 'mean'))
+
+    # Push: rellenar cada nivel con el más grueso y suavizar sus vacíos. En los
+    # niveles gruesos los huecos miden pocas celdas, así que pocas iteraciones
+    # por nivel bastan para converger también en huecos grandes.
+    filled = levels[-1].astype(np.float32)
+    for level in reversed(levels[:-1]):
+        level_voids = level == VOID_VALUE
+        upsampled = np.repeat(np.repeat(filled, 2, axis=0), 2, axis=1)[:level.shape[0], :level.shape[1]]
+        filled = np.where(level_voids, upsampled, level).astype(np.float32)
+        _relax(filled, level_voids, iterations)
+    return np.rint(filled).astype(np.int16)
+
+
+class VoidFillCache:
+    """
+    Bloques rellenados guardados en disco (un .npz por bloque con vacíos).
+
+    Cada archivo guarda la fecha y el tamaño del .hgt de origen y se
+    recalcula si el origen cambia.
+    """
+
+    def __init__(self, cache_dir=VOID_FILL_CACHE_DIR, iterations: int = VOID_FILL_ITERATIONS):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.iterations = iterations
+
+    def _tile_path(self, lat_int: int, lon_int: int) -> Path:
+        return self.cache_dir / f"filled_{lat_int}_{lon_int}.npz"
+
+    def _read(self, path: Path, signature: tuple):
+        if not path.is_file():
+            return None
+        try:
+            with np.load(path) as npz:
+                if (int(npz['format_version']) != VOID_FILL_FORMAT_VERSION or
+                        int(npz['iterations']) != self.iterations or
+                        (float(npz['source_mtime']), int(npz['source_size'])) != signature):
+                    return None
+                return npz['tile']
+        except Exception as e:
+            print(f"No se pudo leer {path}: {e}")
+            return None
+
+    def _write(self, path: Path, signature: tuple, tile: np.ndarray):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Temporal con nombre único: varios procesos pueden rellenar el mismo bloque a la vez
+        f = tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=path.name + '.', suffix='.tmp', delete=False)
+        try:
+            with f:
+                np.savez(f, format_version=np.array(VOID_FILL_FORMAT_VERSION), iterations=np.array(self.iterations),
+                         source_mtime=np.array(signature[0]), source_size=np.array(signature[1]), tile=tile)
+            os.replace(f.name, path)
+        except BaseException:
+            Path(f.name).unlink(missing_ok=True)
+            raise
+
+    def get_filled(self, lat_int: int, lon_int: int, tile: np.ndarray, source_path) -> np.ndarray:
+        """
+        Devuelve el bloque sin vacíos, leyéndolo del disco o rellenándolo y guardándolo.
+        """
+        voids = tile == VOID_VALUE
+        if not voids.any() or voids.all():
+            return tile
+        st = os.stat(source_path)
+        signature = (float(st.st_mtime), int(st.st_size))
+        path = self._tile_path(lat_int, lon_int) if self.cache_dir else None
+        filled = self._read(path, signature) if path else None
+        if filled is None:
+            filled = fill_voids(tile, self.iterations)
+            print(f"Vacíos rellenados en el bloque ({lat_int}, {lon_int}): {int(voids.sum())} celdas")
+            if path:
+                try:
+                    self._write(path, signature, filled)
+                except Exception as e:
+                    print(f"No se pudo guardar el bloque rellenado en {self.cache_dir}: {e}")
+        return filled
@@ -9,45 +9,21 @@ from PyQt5.QtWidgets import (
     QLabel, QLineEdit, QPushButton, QComboBox, QSlider, QGroupBox,
     QTextEdit, QMessageBox, QProgressBar, QFrame, QSpacerItem, QSizePolicy
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer
 from PyQt5.QtGui import QIcon, QFont, QColor, QPalette
 
 from core.terrain_data import TerrainDataLoader
 from core.viewer_3d import Horizon3DViewer
+from gui.view_jobs import ViewJobScheduler
 from config import (
     PRESET_LOCATIONS, DEFAULT_VIEW_RADIUS_KM, DEFAULT_FIELD_OF_VIEW,
     EQUATOR_LAT_RANGE, EQUATOR_LON_RANGE, OBSERVER_HEIGHT_M,
-    MSG_LOADING_TERRAIN, MSG_GENERATING_VIEW, MSG_READY,
+    MSG_GENERATING_VIEW, MSG_READY,
     MSG_ERROR_COORDS, MSG_ERROR_NO_DATA, MSG_ERROR_PYVISTA
 )
 
-class ViewGenerationWorker(QThread):
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
-    progress = pyqtSignal(str)
-
-    def __init__(self, viewer: Horizon3DViewer, lat: float, lon: float, azimut: int, location_name: str = "Ubicación Personalizada", parent=None):
-        super().__init__(parent)
-        self.viewer = viewer
-        self.lat = lat
-        self.lon = lon
-        self.azimut = azimut
-        self.location_name = location_name
-
-    def run(self):
-        try:
-            self.progress.emit(MSG_LOADING_TERRAIN)
-            if self.viewer.terrain_loader.full_terrain_matrix is None:
-                self.viewer.terrain_loader.load_full_terrain_matrix()
-            self.progress.emit(MSG_GENERATING_VIEW)
-            view_info = self.viewer.generate_3d_view(
-                self.lat, self.lon, self.azimut,
-                DEFAULT_FIELD_OF_VIEW, DEFAULT_VIEW_RADIUS_KM,
-                location_name=self.location_name
-            )
-            self.finished.emit(view_info)
-        except Exception as e:
-            self.error.emit(str(e))
+VIEW_EVENTS_INTERVAL_MS = 30  # Cada cuánto se procesan los eventos de la ventana 3D abierta
+CAMERA_UPDATE_INTERVAL_MS = 33  # Mínimo entre giros de cámara al mover el azimut (~30 fotogramas/s)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -58,9 +34,22 @@ class MainWindow(QMainWindow):
 
         self.terrain_loader = TerrainDataLoader()
         self.viewer_3d = Horizon3DViewer(self.terrain_loader)
-        self.view_thread = None
+        self.view_scheduler = ViewJobScheduler(self.viewer_3d, parent=self)
+        self.view_events_timer = QTimer(self)
+        self.view_events_timer.setInterval(VIEW_EVENTS_INTERVAL_MS)
+        self.view_events_timer.timeout.connect(self._process_view_events)
+        self.pending_camera_azimut = None
+        self.camera_timer = QTimer(self)
+        self.camera_timer.setSingleShot(True)
+        self.camera_timer.setInterval(CAMERA_UPDATE_INTERVAL_MS)
+        self.camera_timer.timeout.connect(self._apply_pending_camera_azimut)
 
         self._create_ui()
+        self.view_scheduler.stage_ready.connect(self._on_view_stage_ready)
+        self.view_scheduler.finished.connect(self._on_view_generated)
+        self.view_scheduler.error.connect(self._on_view_error)
+        self.view_scheduler.progress.connect(self.status_bar_label.setText)
+        self.view_scheduler.progress_value.connect(self.progress_bar.setValue)
         self._load_initial_data()
 
     def _create_ui(self):
@@ -231,6 +220,7 @@ class MainWindow(QMainWindow):
         """)
         self.azimut_slider.valueChanged.connect(self._update_azimut_display)
         self.azimut_slider.valueChanged.connect(self._update_info_panel)
+        self.azimut_slider.valueChanged.connect(self._on_azimut_changed)
         azimut_layout.addWidget(self.azimut_slider)
 
         self.azimut_value_label = QLabel("90° (Este)")
@@ -332,19 +322,42 @@ class MainWindow(QMainWindow):
         self.status_bar_label.setText("Cargando datos de terreno...")
         self.progress_bar.show()
         self.progress_bar.setValue(0)
+        self.view_waiting_for_tiles = False
+        # Cargar primero los bloques cercanos a la ubicación inicial
+        try:
+            self.terrain_loader.load_center = (float(self.lat_input.text()), float(self.lon_input.text()))
+        except ValueError:
+            pass
         self.initial_load_thread = QThread()
         self.terrain_loader.moveToThread(self.initial_load_thread)
-        self.initial_load_thread.started.connect(self.terrain_loader.load_full_terrain_matrix)
+        self.initial_load_thread.started.connect(self.terrain_loader.load_terrain_incremental)
+        self.terrain_loader.tile_loaded.connect(self._on_terrain_tile_loaded)
         self.terrain_loader.full_terrain_matrix_loaded.connect(self._on_initial_terrain_loaded)
         self.terrain_loader.error_loading_matrix.connect(self._on_initial_terrain_error)
         self.initial_load_thread.start()
 
+    def _on_terrain_tile_loaded(self, lat_int: int, lon_int: int, loaded: int, total: int):
+        if not self.view_scheduler.is_busy():
+            self.status_bar_label.setText(f"Cargando datos de terreno: {loaded}/{total} bloques")
+            self.progress_bar.setValue(round(100 * loaded / max(total, 1)))
+        # Generar la vista pedida en cuanto llegan los bloques de su zona
+        if self.view_waiting_for_tiles:
+            try:
+                lat = float(self.lat_input.text())
+                lon = float(self.lon_input.text())
+            except ValueError:
+                # El usuario está editando las coordenadas; se reintenta con el próximo bloque
+                return
+            if self.terrain_loader.is_region_loaded(lat, lon, DEFAULT_VIEW_RADIUS_KM):
+                self._request_view(immediate=True)
+
     def _on_initial_terrain_loaded(self):
-        self.status_bar_label.setText(MSG_READY)
-        self.progress_bar.hide()
         self.initial_load_thread.quit()
         self.initial_load_thread.wait()
-        QMessageBox.information(self, "Carga Completa", "Datos de terreno cargados exitosamente.")
+        # Si hay una vista en curso, su progreso sigue en la barra de estado hasta que termine
+        if not self.view_scheduler.is_busy():
+            self.status_bar_label.setText("Datos de terreno cargados exitosamente.")
+            self.progress_bar.hide()
 
     def _on_initial_terrain_error(self, error_msg):
         self.status_bar_label.setText(f"Error al cargar datos: {error_msg}")
@@ -361,6 +374,7 @@ class MainWindow(QMainWindow):
             self.lat_input.setText(str(lat))
             self.lon_input.setText(str(lon))
             self.status_bar_label.setText(f"Ubicación: {selected_text}")
+            self._on_view_parameters_changed()
         self._update_info_panel()
 
     def _update_azimut_display(self, value):
@@ -405,6 +419,65 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Entrada Inválida", "Latitud y Longitud deben ser números.")
             return False
 
+    def _location_name(self, lat: float, lon: float) -> str:
+        for name, coords in PRESET_LOCATIONS.items():
+            if abs(coords[0] - lat) < 0.01 and abs(coords[1] - lon) < 0.01:
+                return name
+        return "Ubicación Personalizada"
+
+    def _request_view(self, immediate: bool = False):
+        lat = float(self.lat_input.text())
+        lon = float(self.lon_input.text())
+        self.view_waiting_for_tiles = not self.terrain_loader.is_region_loaded(lat, lon, DEFAULT_VIEW_RADIUS_KM)
+        if self.view_waiting_for_tiles:
+            self.view_scheduler.cancel_all()
+            self.status_bar_label.setText("Esperando los datos de terreno de esta zona...")
+            return
+        self.status_bar_label.setText(MSG_GENERATING_VIEW)
+        self.progress_bar.show()
+        self.progress_bar.setValue(0)
+        self.view_scheduler.request_view(lat, lon, self.azimut_slider.value(),
+                                         self._location_name(lat, lon), immediate=immediate)
+
+    def _on_view_parameters_changed(self):
+        # Con la ventana 3D abierta, los cambios de dirección o destino regeneran
+        # la vista; los cambios rápidos se agrupan en una sola solicitud
+        if not self.viewer_3d._plotter_is_alive():
+            return
+        try:
+            lat = float(self.lat_input.text())
+            lon = float(self.lon_input.text())
+        except ValueError:
+            return
+        if (EQUATOR_LAT_RANGE[0] <= lat <= EQUATOR_LAT_RANGE[1] and
+                EQUATOR_LON_RANGE[0] <= lon <= EQUATOR_LON_RANGE[1]):
+            self._request_view()
+
+    def _on_azimut_changed(self, azimut: int):
+        # Con la ventana 3D abierta solo se gira la cámara (limitado a un giro
+        # cada CAMERA_UPDATE_INTERVAL_MS); la malla se reconstruye únicamente si
+        # el nuevo azimut sale de la cuña con la que se construyó
+        if not self.viewer_3d._plotter_is_alive():
+            return
+        if self.camera_timer.isActive():
+            self.pending_camera_azimut = azimut
+            return
+        self._apply_camera_azimut(azimut)
+        self.camera_timer.start()
+
+    def _apply_pending_camera_azimut(self):
+        if self.pending_camera_azimut is not None:
+            azimut, self.pending_camera_azimut = self.pending_camera_azimut, None
+            self._apply_camera_azimut(azimut)
+            self.camera_timer.start()
+
+    def _apply_camera_azimut(self, azimut: int):
+        if not self.viewer_3d._plotter_is_alive():
+            return
+        self.viewer_3d.update_camera_direction(azimut)
+        if not self.viewer_3d.covers_azimut(azimut):
+            self._on_view_parameters_changed()
+
     def _start_view_generation(self):
         if not self._validate_coordinates():
             return
@@ -413,11 +486,7 @@ class MainWindow(QMainWindow):
         azimut = self.azimut_slider.value()
 
         # Obtener nombre de ubicación
-        location_name = "Ubicación Personalizada"
-        for name, coords in PRESET_LOCATIONS.items():
-            if abs(coords[0] - lat) < 0.01 and abs(coords[1] - lon) < 0.01:
-                location_name = name
-                break
+        location_name = self._location_name(lat, lon)
 
         reply = QMessageBox.question(self, "Confirmación de Vista",
                                      f"¿Seguro quiere denerar la vista para?:\n\n"
@@ -428,36 +497,46 @@ class MainWindow(QMainWindow):
                                      f"Esto abrirá una ventana separada.",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            self.generate_button.setEnabled(False)
-            self.status_bar_label.setText(MSG_GENERATING_VIEW)
-            self.progress_bar.show()
-            self.progress_bar.setValue(0)
-            # Pasar nombre de ubicación al worker
-            self.view_thread = ViewGenerationWorker(self.viewer_3d, lat, lon, azimut, location_name)
-            self.view_thread.finished.connect(self._on_view_generated)
-            self.view_thread.error.connect(self._on_view_error)
-            self.view_thread.progress.connect(self.status_bar_label.setText)
-            self.view_thread.start()
-
-    def _on_view_generated(self, view_info: dict):
+            # Una nueva solicitud reemplaza (y cancela) a la que esté en curso
+            self._request_view(immediate=True)
+
+    def _on_view_stage_ready(self, stage: dict):
+        # La primera etapa abre la ventana 3D sin bloquear; las siguientes reemplazan la malla
+        window_open = self.viewer_3d._plotter_is_alive()
+        self.viewer_3d.present_view(stage, stage['location_name'])
+        # Conservar la dirección elegida mientras la etapa se construía
+        if self.azimut_slider.value() != stage['azimut'] and self.viewer_3d.covers_azimut(self.azimut_slider.value()):
+            self.viewer_3d.update_camera_direction(self.azimut_slider.value())
+        if not window_open:
+            self.viewer_3d.show_view(interactive_update=True)
+            self.view_events_timer.start()
+
+    def _process_view_events(self):
+        if self.viewer_3d._plotter_is_alive():
+            self.viewer_3d.process_events()
+        else:
+            self.view_events_timer.stop()
+
+    def _on_view_generated(self, stage: dict):
         self.status_bar_label.setText(MSG_READY)
-        self.generate_button.setEnabled(True)
         self.progress_bar.hide()
-        QMessageBox.information(self, "Vista Generada", "La vista ha sido generada exitosamente. La ventana de visualización se abrirá.")
-        self.viewer_3d.show_view()
 
     def _on_view_error(self, error_msg: str):
         self.status_bar_label.setText(f"Error: {error_msg}")
-        self.generate_button.setEnabled(True)
         self.progress_bar.hide()
         QMessageBox.critical(self, "Error de Visualización", f"No se pudo generar la vista:\n{error_msg}")
         if "PyVista no está instalado" in error_msg:
             QMessageBox.information(self, "Instalación Requerida", "Por favor, instale PyVista: pip install pyvista")
 
     def closeEvent(self, event):
-        if self.view_thread and self.view_thread.isRunning():
-            self.view_thread.quit()
-            self.view_thread.wait()
+        self.view_events_timer.stop()
+        self.camera_timer.stop()
+        # Cancelar las vistas en curso y esperar a que los hilos del pool terminen
+        self.view_scheduler.shutdown()
+        if self.initial_load_thread.isRunning():
+            self.terrain_loader.cancel_loading()
+            self.initial_load_thread.quit()
+            self.initial_load_thread.wait()
         if self.viewer_3d.plotter:
             self.viewer_3d.plotter.close()
         super().closeEvent(event)
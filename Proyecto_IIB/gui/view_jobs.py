@@ -0,0 +1,207 @@
+# gui/view_jobs.py
+"""
+Cola de trabajos de generación de vistas para la interfaz gráfica (PyQt5).
+
+Cada solicitud nueva reemplaza a las anteriores: las que aún no empezaron
+se descartan, las que están corriendo se cancelan entre etapas y los
+resultados tardíos de solicitudes viejas se ignoran. Los cambios rápidos
+de parámetros (slider, destinos) se agrupan con una breve espera y solo se
+genera la última vista pedida.
+"""
+
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from core.viewer_3d import Horizon3DViewer
+from config import (
+    DEFAULT_VIEW_RADIUS_KM, DEFAULT_FIELD_OF_VIEW, VIEW_WORKER_THREADS, VIEW_REQUEST_DEBOUNCE_MS,
+    MSG_LOADING_TERRAIN, MSG_GENERATING_VIEW
+)
+
+
+class ViewGenerationJob(QRunnable):
+    """
+    Construye una vista de gruesa a fina en un hilo del pool.
+
+    Los resultados se envían al planificador con el número de solicitud,
+    que decide en el hilo de la interfaz si siguen vigentes.
+    """
+
+    def __init__(self, scheduler: "ViewJobScheduler", request_id: int, request: dict):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.scheduler = scheduler
+        self.request_id = request_id
+        self.request = request
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        scheduler = self.scheduler
+        viewer = scheduler.viewer
+        request = self.request
+        try:
+            if self.cancelled.is_set():
+                return
+            scheduler._job_progress.emit(self.request_id, MSG_LOADING_TERRAIN, 0)
+            if viewer.terrain_loader.full_terrain_matrix is None:
+                viewer.terrain_loader.load_full_terrain_matrix()
+            scheduler._job_progress.emit(self.request_id, MSG_GENERATING_VIEW, 0)
+            stage = None
+            for stage in viewer.iter_view_stages(
+                request['lat'], request['lon'], request['azimut'],
+                request['field_of_view'], request['view_radius_km'],
+                window_aspect=request['window_aspect'],
+                should_cancel=self.cancelled.is_set,
+                on_progress=lambda fraction: scheduler._job_progress.emit(
+                    self.request_id, MSG_GENERATING_VIEW, round(fraction * 100))
+            ):
+                stage['location_name'] = request['location_name']
+                scheduler._job_stage.emit(self.request_id, stage)
+                message = MSG_GENERATING_VIEW
+                if stage['preview']:
+                    message = f"{MSG_GENERATING_VIEW} ({stage['level'] + 1}/{stage['levels']})"
+                scheduler._job_progress.emit(self.request_id, message, round(stage['progress'] * 100))
+            if not self.cancelled.is_set():
+                scheduler._job_finished.emit(self.request_id, stage)
+        except Exception as e:
+            scheduler._job_error.emit(self.request_id, str(e))
+        finally:
+            scheduler._job_done.emit(self)
+
+
+class ViewJobScheduler(QObject):
+    """
+    Planificador de vistas sobre un pool acotado de hilos.
+
+    Las señales públicas solo se emiten para la solicitud más reciente y
+    siempre en el hilo de la interfaz.
+    """
+    stage_ready = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(str)
+    progress_value = pyqtSignal(int)
+
+    # Señales internas, emitidas desde los hilos del pool
+    _job_stage = pyqtSignal(int, object)
+    _job_progress = pyqtSignal(int, str, int)
+    _job_finished = pyqtSignal(int, object)
+    _job_error = pyqtSignal(int, str)
+    _job_done = pyqtSignal(object)
+
+    def __init__(self, viewer: Horizon3DViewer, max_threads: int = VIEW_WORKER_THREADS,
+                 debounce_ms: int = VIEW_REQUEST_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.viewer = viewer
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, max_threads))
+        self.request_id = 0
+        self.jobs = []
+        self.retired_jobs = []
+        self.pending_request = None
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_ms)
+        self.debounce_timer.timeout.connect(self._submit_pending)
+
+        self._job_stage.connect(self._on_job_stage)
+        self._job_progress.connect(self._on_job_progress)
+        self._job_finished.connect(self._on_job_finished)
+        self._job_error.connect(self._on_job_error)
+        self._job_done.connect(self._on_job_done)
+
+    # --- Métodos privados ---
+
+    def _is_current(self, request_id: int) -> bool:
+        return request_id == self.request_id
+
+    def _cancel_jobs(self):
+        for job in list(self.jobs):
+            job.cancel()
+            if self.pool.tryTake(job):
+                # Aún no había empezado: se descarta sin ejecutarse
+                self.jobs.remove(job)
+
+    def _submit_pending(self):
+        request, self.pending_request = self.pending_request, None
+        if request is None:
+            return
+        self._cancel_jobs()
+        # Los trabajos terminados se conservan hasta aquí para no destruirlos
+        # mientras su hilo aún sale de run()
+        self.retired_jobs.clear()
+        self.request_id += 1
+        job = ViewGenerationJob(self, self.request_id, request)
+        self.jobs.append(job)
+        self.pool.start(job)
+
+    def _on_job_stage(self, request_id: int, stage: dict):
+        if self._is_current(request_id):
+            self.stage_ready.emit(stage)
+
+    def _on_job_progress(self, request_id: int, message: str, percent: int):
+        if self._is_current(request_id):
+            self.progress.emit(message)
+            self.progress_value.emit(percent)
+
+    def _on_job_finished(self, request_id: int, stage):
+        if self._is_current(request_id):
+            self.finished.emit(stage)
+
+    def _on_job_error(self, request_id: int, message: str):
+        if self._is_current(request_id):
+            self.error.emit(message)
+
+    def _on_job_done(self, job: ViewGenerationJob):
+        if job in self.jobs:
+            self.jobs.remove(job)
+            self.retired_jobs.append(job)
+
+    # --- Métodos públicos ---
+
+    def request_view(self, lat: float, lon: float, azimut: int, location_name: str = "Ubicación Personalizada",
+                     field_of_view: int = DEFAULT_FIELD_OF_VIEW, view_radius_km: int = DEFAULT_VIEW_RADIUS_KM,
+                     immediate: bool = False):
+        """
+        Pide una vista; reemplaza a cualquier solicitud anterior.
+
+        Salvo con ``immediate``, la solicitud espera ``debounce_ms`` y, si
+        mientras tanto llega otra, solo se genera la última. La proporción de
+        la ventana se toma aquí, en el hilo de la interfaz, porque los hilos
+        del pool no deben leer el plotter.
+        """
+        self.pending_request = {
+            'lat': lat, 'lon': lon, 'azimut': azimut, 'location_name': location_name,
+            'field_of_view': field_of_view, 'view_radius_km': view_radius_km,
+            'window_aspect': self.viewer.window_aspect(),
+        }
+        if immediate:
+            self.debounce_timer.stop()
+            self._submit_pending()
+        else:
+            self.debounce_timer.start()
+
+    def cancel_all(self):
+        """Descarta la solicitud pendiente y cancela las que están en curso."""
+        self.debounce_timer.stop()
+        self.pending_request = None
+        self._cancel_jobs()
+        self.request_id += 1
+
+    def is_busy(self) -> bool:
+        return self.pending_request is not None or bool(self.jobs)
+
+    def shutdown(self, timeout_ms: int = -1) -> bool:
+        """
+        Cancela todo y espera a que terminen los hilos del pool.
+
+        Returns:
+            bool: True si todos los trabajos terminaron dentro del plazo.
+        """
+        self.cancel_all()
+        return self.pool.waitForDone(timeout_ms)
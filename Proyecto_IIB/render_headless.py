@@ -0,0 +1,56 @@
+# render_headless.py
+"""
+Renderiza panoramas del horizonte sin pantalla (servidores) a partir de un CSV.
+
+El CSV debe tener las columnas ``lat,lon,azimut``:
+
+    python render_headless.py trabajos.csv salida/ --formato png
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import pyvista as pv
+
+from core.terrain_data import TerrainDataLoader
+from core.viewer_3d import Horizon3DViewer
+from core.offscreen_renderer import OffscreenHorizonRenderer, OUTPUT_FORMATS
+from config import DATA_DIR, DEFAULT_VIEW_RADIUS_KM, DEFAULT_FIELD_OF_VIEW
+
+def read_jobs(csv_path: str) -> list:
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return [(float(row['lat']), float(row['lon']), int(float(row['azimut'])))
+                for row in csv.DictReader(f)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderizado offscreen de vistas del horizonte.")
+    parser.add_argument('jobs_csv', help="CSV con columnas lat,lon,azimut")
+    parser.add_argument('output_dir', help="Carpeta donde se guardan los fotogramas")
+    parser.add_argument('--formato', choices=OUTPUT_FORMATS, default='png')
+    parser.add_argument('--radio', type=int, default=DEFAULT_VIEW_RADIUS_KM, help="Radio de visualización en km")
+    parser.add_argument('--fov', type=int, default=DEFAULT_FIELD_OF_VIEW, help="Campo de visión en grados")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_DIR):
+        print(f"Error: La carpeta de datos '{DATA_DIR}' no se encontró.")
+        sys.exit(1)
+
+    pv.OFF_SCREEN = True
+    loader = TerrainDataLoader()
+    loader.load_full_terrain_matrix()
+    renderer = OffscreenHorizonRenderer(Horizon3DViewer(loader), field_of_view=args.fov,
+                                        view_radius_km=args.radio)
+    try:
+        results = renderer.render_jobs(read_jobs(args.jobs_csv), args.output_dir, args.formato)
+    finally:
+        renderer.close()
+
+    if results:
+        frame_times = [r['frame_time_s'] for r in results]
+        print(f"{len(results)} fotogramas | promedio {1000 * sum(frame_times) / len(frame_times):.0f} ms "
+              f"| máximo {1000 * max(frame_times):.0f} ms")
+
+if __name__ == "__main__":
+    main()
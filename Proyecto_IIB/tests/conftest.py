@@ -0,0 +1,9 @@
+# tests/conftest.py
+"""
+Configuración de pytest: permite importar ``core`` y ``config`` desde los tests.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
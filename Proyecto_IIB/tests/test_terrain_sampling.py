@@ -0,0 +1,65 @@
+# tests/test_terrain_sampling.py
+"""
+Interpolación de elevaciones con coordenadas escalares junto a vacíos.
+
+Se usa un bloque .hgt sintético (plano inclinado con un hueco de vacíos),
+de modo que los tests no dependen de la carpeta ``data/``.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from config import HGT_RESOLUTION
+from core.terrain_data import TerrainDataLoader
+from core.terrain_mosaic import VOID_VALUE
+
+SPAN = HGT_RESOLUTION - 1
+VOID_ROWS = slice(600, 611)
+VOID_COLS = slice(600, 611)
+
+
+def plane(row: float, col: float) -> float:
+    return 1000.0 + row + 2.0 * col
+
+
+@pytest.fixture
+def loader(tmp_path):
+    rows, cols = np.mgrid[0:HGT_RESOLUTION, 0:HGT_RESOLUTION]
+    tile = plane(rows, cols).astype(np.int16)
+    tile[VOID_ROWS, VOID_COLS] = VOID_VALUE
+    tile.astype('>i2').tofile(tmp_path / "N00W079.hgt")
+    terrain_loader = TerrainDataLoader(data_directory=str(tmp_path), cache_path=None, fill_voids=False)
+    terrain_loader.load_full_terrain_matrix()
+    return terrain_loader
+
+
+def to_coords(row: float, col: float) -> tuple[float, float]:
+    """Coordenadas del punto (fila, columna) del bloque N00W079."""
+    return 1.0 - row / SPAN, -79.0 + col / SPAN
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'bicubic'])
+def test_scalar_next_to_void_uses_valid_neighbours(loader, method):
+    # La vecindad 4x4 toca el hueco, pero los cuatro vecinos bilineales son válidos
+    lat, lon = to_coords(598.5, 600.5)
+    value = loader.sample_elevations(lat, lon, method)
+    assert np.ndim(value) == 0
+    assert float(value) == pytest.approx(plane(598.5, 600.5), abs=1e-6)
+    assert loader.get_elevation_at_coords(lat, lon, method) == pytest.approx(plane(598.5, 600.5), abs=1e-6)
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'bicubic'])
+def test_scalar_inside_void_is_nan(loader, method):
+    lat, lon = to_coords(605.5, 605.5)
+    assert math.isnan(float(loader.sample_elevations(lat, lon, method)))
+    assert loader.get_elevation_at_coords(lat, lon, method) == 0.0
+
+
+@pytest.mark.parametrize('method', ['bilinear', 'bicubic'])
+def test_array_shape_is_preserved(loader, method):
+    lats, lons = to_coords(np.array([[100.25, 598.5]]), np.array([[200.75, 600.5]]))
+    values = loader.sample_elevations(lats, lons, method)
+    assert values.shape == (1, 2)
+    np.testing.assert_allclose(values, [[plane(100.25, 200.75), plane(598.5, 600.5)]], atol=1e-6)